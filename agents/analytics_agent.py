@@ -1,22 +1,135 @@
 """
 Analytics agent for data aggregations and analysis
 """
-from typing import Any, Dict, List
+from functools import partial
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import orjson
 from agents.base_agent import BaseAgent
-from utils.helpers import format_aggregation_response
+from utils.cache import LRUCache
+from utils.helpers import format_aggregation_response, query_fingerprint
 
+# (index, aggregations, query, search options, response formatter)
+AggregationRequest = Tuple[str, Dict[str, Any], Optional[Dict], Dict[str, Any], Callable[[Dict[str, Any]], Any]]
 
-class AnalyticsAgent(BaseAgent):
-    """Agent specialized in data analytics and aggregations"""
+# Builders for multi_aggregation sub-aggregations, keyed by aggregation type
+_AGG_BUILDERS = {
+    "terms": lambda qb, field, params: qb.aggregation_terms(field, params.get("size", 10)),
+    "stats": lambda qb, field, params: qb.aggregation_stats(field),
+    "avg": lambda qb, field, params: qb.aggregation_avg(field),
+    "sum": lambda qb, field, params: qb.aggregation_sum(field),
+    "cardinality": lambda qb, field, params: qb.aggregation_cardinality(
+        field, params.get("precision_threshold")
+    )
+}
+
+# Upper bound on the encoded bucket rows returned by a single tool call
+_MAX_BUCKET_BYTES = 64 * 1024
+_ENCODE_BATCH_ROWS = 256
+
+# Fields copied from a stats aggregation result, fetched with one C-level call
+_STATS_FIELDS = ("count", "sum", "avg", "min", "max")
+_stats_values = itemgetter(*_STATS_FIELDS)
+
+# What Elasticsearch returns for each aggregation type when no documents match
+_EMPTY_AGGREGATIONS = {
+    "terms": {"buckets": []},
+    "date_histogram": {"buckets": []},
+    "stats": {"count": 0, "min": None, "max": None, "avg": None, "sum": 0.0},
+    "avg": {"value": None},
+    "sum": {"value": 0.0},
+    "cardinality": {"value": 0}
+}
+
+
+def _encode_buckets(buckets: List[Dict[str, Any]], label: str, key: str,
+                    max_bytes: int = _MAX_BUCKET_BYTES) -> Tuple[bytes, int]:
+    """
+    Encode aggregation buckets as a JSON array of {label, count} rows
     
-    def __init__(self):
-        super().__init__(
-            name="AnalyticsAgent",
-            role="Expert in analyzing data using Elasticsearch aggregations"
-        )
+    Rows are encoded in batches so large aggregations spend their time in
+    orjson rather than in per-row calls; encoding stops once the array would
+    grow past max_bytes, so the full row list is never built.
     
-    def get_system_prompt(self) -> str:
-        return """You are an expert Elasticsearch analytics agent. Your role is to:
+    Returns:
+        Encoded array and the number of buckets left out
+    """
+    parts = []
+    size = 2
+    
+    for start in range(0, len(buckets), _ENCODE_BATCH_ROWS):
+        batch = buckets[start:start + _ENCODE_BATCH_ROWS]
+        encoded = orjson.dumps([{label: bucket[key], "count": bucket["doc_count"]} for bucket in batch])
+        
+        if size + len(encoded) - 1 <= max_bytes:
+            parts.append(encoded[1:-1])
+            size += len(encoded) - 1
+            continue
+        
+        # The size budget runs out inside this batch, find the cut row by row
+        for position, bucket in enumerate(batch):
+            row = orjson.dumps({label: bucket[key], "count": bucket["doc_count"]})
+            size += len(row) + 1
+            if size > max_bytes:
+                return b"[" + b",".join(parts) + b"]", len(buckets) - start - position
+            parts.append(row)
+    
+    return b"[" + b",".join(parts) + b"]", 0
+
+
+def _truncation(omitted: int) -> Dict[str, Any]:
+    """Fields flagging a result whose buckets were cut to stay within size limits"""
+    return {"truncated": True, "omitted_buckets": omitted} if omitted else {}
+
+
+def _encode_object(fields: Dict[str, Any], encoded: Dict[str, bytes]) -> bytes:
+    """Encode fields as a JSON object, splicing in members that are already encoded"""
+    members = [orjson.dumps(fields)[1:-1]] if fields else []
+    members.extend(orjson.dumps(name) + b":" + value for name, value in encoded.items())
+    return b"{" + b",".join(members) + b"}"
+
+
+def _format_buckets(agg_result: Dict[str, Any], max_bytes: int) -> Tuple[bytes, int]:
+    """Encode a bucket sub-aggregation of a multi aggregation"""
+    return _encode_buckets(agg_result["buckets"], "value", "key", max_bytes)
+
+
+def _format_value(agg_result: Dict[str, Any], max_bytes: int) -> Tuple[bytes, int]:
+    """Encode a single-value metric sub-aggregation of a multi aggregation"""
+    return orjson.dumps(agg_result["value"]), 0
+
+
+def _format_passthrough(agg_result: Dict[str, Any], max_bytes: int) -> Tuple[bytes, int]:
+    """Encode a multi-value metric sub-aggregation of a multi aggregation as-is"""
+    return orjson.dumps(agg_result), 0
+
+
+# Formatters for multi_aggregation sub-aggregations, keyed by aggregation type
+_AGG_FORMATTERS = {
+    "terms": _format_buckets,
+    "stats": _format_passthrough,
+    "avg": _format_value,
+    "sum": _format_value,
+    "cardinality": _format_value
+}
+
+
+def _search_options(terminate_after: Optional[int] = None,
+                    return_total: bool = False) -> Dict[str, Any]:
+    """Build search-level options for an aggregation request"""
+    options = {"terminate_after": terminate_after} if terminate_after else {}
+    if return_total:
+        options["track_total_hits"] = True
+    return options
+
+
+def _total_docs(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Total matching documents, present only when the request tracked total hits"""
+    total = result["hits"].get("total")
+    return {"total_docs": total["value"]} if total else {}
+
+
+_SYSTEM_PROMPT = """You are an expert Elasticsearch analytics agent. Your role is to:
 1. Perform data aggregations and analysis
 2. Calculate statistics (avg, sum, min, max, count)
 3. Create histograms and date-based analyses
@@ -35,309 +148,558 @@ Guidelines:
 - Use terms for categorical grouping
 - Use stats for numerical analysis
 - Provide clear interpretations of results"""
-    
-    def get_tools_schema(self) -> List[Dict[str, Any]]:
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "terms_aggregation",
-                    "description": "Group documents by field values and count occurrences (top N most common values)",
-                    "parameters": {
+
+# Static tools schema, built once at import time and shared by all instances
+_TOOLS_SCHEMA = [
+    {
+        "type": "function",
+        "function": {
+            "name": "terms_aggregation",
+            "description": "Group documents by field values and count occurrences (top N most common values)",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
+                    },
+                    "field": {
+                        "type": "string",
+                        "description": "Field to aggregate on (must be keyword type)"
+                    },
+                    "size": {
+                        "type": "integer",
+                        "description": "Number of top buckets to return",
+                        "default": 10
+                    },
+                    "execution_hint": {
+                        "type": "string",
+                        "enum": ["global_ordinals", "map"],
+                        "description": "Collection strategy; 'map' can be cheaper when the query matches few documents"
+                    },
+                    "shard_size": {
+                        "type": "integer",
+                        "description": "Candidate buckets collected per shard (higher is more accurate, slower)"
+                    },
+                    "terminate_after": {
+                        "type": "integer",
+                        "description": "Stop collecting after this many documents per shard; results become approximate"
+                    },
+                    "return_total": {
+                        "type": "boolean",
+                        "description": "Also return the exact number of matching documents (slower on large indices)",
+                        "default": False
+                    },
+                    "query": {
                         "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            },
-                            "field": {
-                                "type": "string",
-                                "description": "Field to aggregate on (must be keyword type)"
-                            },
-                            "size": {
-                                "type": "integer",
-                                "description": "Number of top buckets to return",
-                                "default": 10
-                            },
-                            "query": {
-                                "type": "object",
-                                "description": "Optional query to filter documents before aggregation"
-                            }
-                        },
-                        "required": ["index", "field"]
+                        "description": "Optional query to filter documents before aggregation"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "date_histogram",
-                    "description": "Analyze data over time periods (by day, week, month, etc.)",
-                    "parameters": {
+                },
+                "required": ["index", "field"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "date_histogram",
+            "description": "Analyze data over time periods (by day, week, month, etc.)",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
+                    },
+                    "field": {
+                        "type": "string",
+                        "description": "Date field to histogram on"
+                    },
+                    "interval": {
+                        "type": "string",
+                        "enum": ["1h", "1d", "1w", "1M", "1y"],
+                        "description": "Time interval for buckets"
+                    },
+                    "return_total": {
+                        "type": "boolean",
+                        "description": "Also return the exact number of matching documents (slower on large indices)",
+                        "default": False
+                    },
+                    "query": {
                         "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            },
-                            "field": {
-                                "type": "string",
-                                "description": "Date field to histogram on"
-                            },
-                            "interval": {
-                                "type": "string",
-                                "enum": ["1h", "1d", "1w", "1M", "1y"],
-                                "description": "Time interval for buckets"
-                            },
-                            "query": {
-                                "type": "object",
-                                "description": "Optional query to filter documents"
-                            }
-                        },
-                        "required": ["index", "field", "interval"]
+                        "description": "Optional query to filter documents"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "stats_aggregation",
-                    "description": "Calculate statistical metrics (count, sum, avg, min, max) for a numeric field",
-                    "parameters": {
+                },
+                "required": ["index", "field", "interval"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "stats_aggregation",
+            "description": "Calculate statistical metrics (count, sum, avg, min, max) for a numeric field",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
+                    },
+                    "field": {
+                        "type": "string",
+                        "description": "Numeric field to analyze"
+                    },
+                    "return_total": {
+                        "type": "boolean",
+                        "description": "Also return the exact number of matching documents (slower on large indices)",
+                        "default": False
+                    },
+                    "query": {
                         "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            },
-                            "field": {
-                                "type": "string",
-                                "description": "Numeric field to analyze"
-                            },
-                            "query": {
-                                "type": "object",
-                                "description": "Optional query to filter documents"
-                            }
-                        },
-                        "required": ["index", "field"]
+                        "description": "Optional query to filter documents"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "cardinality_aggregation",
-                    "description": "Count unique values in a field",
-                    "parameters": {
+                },
+                "required": ["index", "field"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "cardinality_aggregation",
+            "description": "Count unique values in a field",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
+                    },
+                    "field": {
+                        "type": "string",
+                        "description": "Field to count unique values"
+                    },
+                    "precision_threshold": {
+                        "type": "integer",
+                        "description": "Counts below this threshold are close to exact; lower values use less memory",
+                        "default": 3000,
+                        "minimum": 100,
+                        "maximum": 40000
+                    },
+                    "execution_hint": {
+                        "type": "string",
+                        "enum": ["global_ordinals", "segment_ordinals", "direct", "save_memory_heuristic", "save_time_heuristic"],
+                        "description": "Collection strategy for counting unique values"
+                    },
+                    "terminate_after": {
+                        "type": "integer",
+                        "description": "Stop collecting after this many documents per shard; results become approximate"
+                    },
+                    "return_total": {
+                        "type": "boolean",
+                        "description": "Also return the exact number of matching documents (slower on large indices)",
+                        "default": False
+                    },
+                    "query": {
                         "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            },
-                            "field": {
-                                "type": "string",
-                                "description": "Field to count unique values"
-                            },
-                            "query": {
-                                "type": "object",
-                                "description": "Optional query to filter documents"
-                            }
-                        },
-                        "required": ["index", "field"]
+                        "description": "Optional query to filter documents"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "multi_aggregation",
-                    "description": "Perform multiple aggregations at once",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            },
-                            "aggregations": {
-                                "type": "array",
-                                "description": "Array of aggregation definitions",
-                                "items": {
+                },
+                "required": ["index", "field"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "multi_aggregation",
+            "description": "Perform multiple aggregations at once",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
+                    },
+                    "aggregations": {
+                        "type": "array",
+                        "description": "Array of aggregation definitions",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string"},
+                                "type": {"type": "string"},
+                                "field": {"type": "string"},
+                                "params": {
                                     "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "type": {"type": "string"},
-                                        "field": {"type": "string"},
-                                        "params": {"type": "object"}
-                                    }
+                                    "description": "Type-specific options: size (terms), precision_threshold (cardinality)"
                                 }
-                            },
-                            "query": {
-                                "type": "object",
-                                "description": "Optional query to filter documents"
                             }
-                        },
-                        "required": ["index", "aggregations"]
+                        }
+                    },
+                    "return_total": {
+                        "type": "boolean",
+                        "description": "Also return the exact number of matching documents (slower on large indices)",
+                        "default": False
+                    },
+                    "query": {
+                        "type": "object",
+                        "description": "Optional query to filter documents"
                     }
-                }
+                },
+                "required": ["index", "aggregations"]
             }
-        ]
+        }
+    }
+]
+
+
+class AnalyticsAgent(BaseAgent):
+    """Agent specialized in data analytics and aggregations"""
+    
+    read_only_tools = frozenset((
+        "terms_aggregation", "date_histogram", "stats_aggregation",
+        "cardinality_aggregation", "multi_aggregation"
+    ))
+    
+    def __init__(self):
+        super().__init__(
+            name="AnalyticsAgent",
+            role="Expert in analyzing data using Elasticsearch aggregations"
+        )
+        
+        self._dispatch = {
+            "terms_aggregation": self._terms_aggregation,
+            "date_histogram": self._date_histogram,
+            "stats_aggregation": self._stats_aggregation,
+            "cardinality_aggregation": self._cardinality_aggregation,
+            "multi_aggregation": self._multi_aggregation
+        }
+        
+        # Filter query match counts and aggregation responses, reset for every user query
+        self._count_cache = LRUCache(maxsize=128)
+        self._aggregation_cache = LRUCache(maxsize=512)
+        
+        # Tools whose calls can be batched into a single _msearch request
+        self._aggregation_requests = {
+            "terms_aggregation": self._terms_request,
+            "date_histogram": self._date_histogram_request,
+            "stats_aggregation": self._stats_request,
+            "cardinality_aggregation": self._cardinality_request,
+            "multi_aggregation": self._multi_request
+        }
+    
+    def get_system_prompt(self) -> str:
+        return _SYSTEM_PROMPT
+    
+    def get_tools_schema(self) -> List[Dict[str, Any]]:
+        return _TOOLS_SCHEMA
+    
+    def execute(self, user_query: str, max_iterations: int = 5) -> str:
+        """Execute agent with user query, starting with empty caches"""
+        self._count_cache.clear()
+        self._aggregation_cache.clear()
+        return super().execute(user_query, max_iterations)
     
     def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
         """Execute analytics tools"""
         
-        if tool_name == "terms_aggregation":
-            return self._terms_aggregation(**arguments)
-        elif tool_name == "date_histogram":
-            return self._date_histogram(**arguments)
-        elif tool_name == "stats_aggregation":
-            return self._stats_aggregation(**arguments)
-        elif tool_name == "cardinality_aggregation":
-            return self._cardinality_aggregation(**arguments)
-        elif tool_name == "multi_aggregation":
-            return self._multi_aggregation(**arguments)
-        else:
+        handler = self._dispatch.get(tool_name)
+        if handler is None:
             return {"error": f"Unknown tool: {tool_name}"}
+        return handler(**arguments)
     
-    def _terms_aggregation(self, index: str, field: str, 
-                          size: int = 10, query: Dict = None) -> Dict[str, Any]:
-        """Perform terms aggregation"""
-        agg = {
-            "top_terms": self.query_builder.aggregation_terms(field, size)
-        }
+    def execute_tools(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Ship the aggregation calls of one turn in a single _msearch request"""
+        batched = [i for i, (name, _) in enumerate(calls) if name in self._aggregation_requests]
         
-        result = self.es_tools.aggregate(index, agg, query)
+        if len(batched) < 2:
+            return super().execute_tools(calls)
         
+        results = [None] * len(calls)
+        requests = []
+        searches = []
+        
+        # Filter queries without a cached count get a count probe in the same
+        # _msearch instead of a blocking count each, keyed by count cache key
+        probes: Dict[Tuple[str, bytes], int] = {}
+        
+        for i in batched:
+            tool_name, arguments = calls[i]
+            try:
+                index, agg, query, options, formatter = self._aggregation_requests[tool_name](**arguments)
+            except Exception as e:
+                results[i] = {"error": str(e)}
+                continue
+            
+            body = self.query_builder.aggregation_body(agg, query, **options)
+            key = self._aggregation_key(index, body)
+            cached = self._aggregation_cache.get(key)
+            count_key = self._count_key(index, query) if query else None
+            
+            if cached is not None:
+                results[i] = self._format_aggregation(cached, formatter)
+            elif count_key and self._count_cache.get(count_key) == 0:
+                results[i] = self._format_aggregation(
+                    self._empty_response(agg, options.get("track_total_hits", False)), formatter
+                )
+            else:
+                if count_key and count_key not in probes and self._count_cache.get(count_key) is None:
+                    probes[count_key] = len(searches)
+                    searches.append((index, {"query": query, "size": 0, "track_total_hits": True}))
+                requests.append((i, len(searches), agg, options, key, count_key, formatter))
+                searches.append((index, body))
+        
+        if searches:
+            responses = self.es_tools.msearch(searches)
+            
+            for count_key, position in probes.items():
+                total = responses[position].get("hits", {}).get("total", {}).get("value")
+                if total is not None:
+                    self._count_cache.set(count_key, total)
+            
+            for i, position, agg, options, key, count_key, formatter in requests:
+                response = responses[position]
+                if count_key and self._count_cache.get(count_key) == 0:
+                    # Same shape as the single-call path, which skips the aggregation
+                    response = self._empty_response(agg, options.get("track_total_hits", False))
+                elif "error" not in response:
+                    self._aggregation_cache.set(key, response)
+                results[i] = self._format_aggregation(response, formatter)
+        
+        # Non-aggregation tools still run through the regular path
+        others = [i for i in range(len(calls)) if i not in batched]
+        if others:
+            for i, result in zip(others, super().execute_tools([calls[i] for i in others])):
+                results[i] = result
+        
+        return results
+    
+    def _run_aggregation(self, index: str, agg: Dict[str, Any], query: Optional[Dict],
+                         options: Dict[str, Any],
+                         formatter: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Run a single aggregation request and format its response"""
+        key = self._aggregation_key(
+            index, self.query_builder.aggregation_body(agg, query, **options)
+        )
+        result = self._aggregation_cache.get(key)
+        
+        if result is None:
+            if self._matches_nothing(index, query):
+                return self._format_aggregation(
+                    self._empty_response(agg, options.get("track_total_hits", False)), formatter
+                )
+            
+            result = self.es_tools.aggregate(index, agg, query, **options)
+            if "error" not in result:
+                self._aggregation_cache.set(key, result)
+        
+        return self._format_aggregation(result, formatter)
+    
+    @staticmethod
+    def _aggregation_key(index: str, body: Dict[str, Any]) -> Tuple[str, bytes]:
+        """Build a cache key from the index and a digest of the canonical request body"""
+        return index, query_fingerprint(body)
+    
+    @staticmethod
+    def _count_key(index: str, query: Dict[str, Any]) -> Tuple[str, bytes]:
+        """Build a count cache key from the index and a digest of the canonical query"""
+        return index, query_fingerprint(query)
+    
+    def _matches_nothing(self, index: str, query: Optional[Dict]) -> bool:
+        """Check with a cheap count whether a filter query matches no documents"""
+        if not query:
+            return False
+        
+        key = self._count_key(index, query)
+        count = self._count_cache.get(key)
+        
+        if count is None:
+            count = self.es_tools.count(index, query)
+            if count is None:
+                return False
+            self._count_cache.set(key, count)
+        
+        return count == 0
+    
+    @staticmethod
+    def _empty_response(agg: Dict[str, Any], track_total_hits: bool = False) -> Dict[str, Any]:
+        """Build the aggregation response for a query that matches no documents"""
+        return {
+            # Like Elasticsearch, only report the total when it was asked for
+            "hits": {"total": {"value": 0}} if track_total_hits else {},
+            "aggregations": {
+                name: dict(_EMPTY_AGGREGATIONS.get(next(iter(agg_body)), {}))
+                for name, agg_body in agg.items()
+            }
+        }
+    
+    @staticmethod
+    def _format_aggregation(result: Dict[str, Any],
+                            formatter: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Format an aggregation response, passing errors through"""
         if "error" in result:
             return result
         
-        # Format results
+        try:
+            return formatter(result)
+        except (KeyError, TypeError) as e:
+            return {"error": f"Unexpected aggregation response: {e}"}
+    
+    def _terms_aggregation(self, index: str, field: str, 
+                          size: int = 10, execution_hint: str = None,
+                          shard_size: int = None, terminate_after: int = None,
+                          return_total: bool = False, query: Dict = None) -> Any:
+        """Perform terms aggregation"""
+        return self._run_aggregation(*self._terms_request(
+            index, field, size, execution_hint, shard_size, terminate_after, return_total, query
+        ))
+    
+    def _terms_request(self, index: str, field: str, 
+                       size: int = 10, execution_hint: str = None,
+                       shard_size: int = None, terminate_after: int = None,
+                       return_total: bool = False, query: Dict = None) -> AggregationRequest:
+        """Build terms aggregation request"""
+        agg = {
+            "top_terms": self.query_builder.aggregation_terms(
+                field, size, execution_hint=execution_hint, shard_size=shard_size
+            )
+        }
+        return index, agg, query, _search_options(terminate_after, return_total), self._format_terms
+    
+    @staticmethod
+    def _format_terms(result: Dict[str, Any]) -> bytes:
+        """Format terms aggregation response as encoded JSON"""
         buckets = result["aggregations"]["top_terms"]["buckets"]
         
-        return {
-            "total_docs": result["hits"]["total"]["value"],
-            "results": [
-                {
-                    "value": bucket["key"],
-                    "count": bucket["doc_count"]
-                }
-                for bucket in buckets
-            ]
-        }
+        results, omitted = _encode_buckets(buckets, "value", "key")
+        
+        return _encode_object(
+            {**_total_docs(result), **_truncation(omitted)},
+            {"results": results}
+        )
     
-    def _date_histogram(self, index: str, field: str, 
-                       interval: str, query: Dict = None) -> Dict[str, Any]:
+    def _date_histogram(self, index: str, field: str, interval: str,
+                       return_total: bool = False, query: Dict = None) -> Any:
         """Perform date histogram aggregation"""
+        return self._run_aggregation(*self._date_histogram_request(
+            index, field, interval, return_total, query
+        ))
+    
+    def _date_histogram_request(self, index: str, field: str, interval: str,
+                                return_total: bool = False,
+                                query: Dict = None) -> AggregationRequest:
+        """Build date histogram aggregation request"""
         agg = {
             "timeline": self.query_builder.aggregation_date_histogram(field, interval)
         }
-        
-        result = self.es_tools.aggregate(index, agg, query)
-        
-        if "error" in result:
-            return result
-        
-        # Format results
+        return index, agg, query, _search_options(return_total=return_total), self._format_date_histogram
+    
+    @staticmethod
+    def _format_date_histogram(result: Dict[str, Any]) -> bytes:
+        """Format date histogram aggregation response as encoded JSON"""
         buckets = result["aggregations"]["timeline"]["buckets"]
         
-        return {
-            "total_docs": result["hits"]["total"]["value"],
-            "timeline": [
-                {
-                    "date": bucket["key_as_string"],
-                    "count": bucket["doc_count"]
-                }
-                for bucket in buckets
-            ]
-        }
+        timeline, omitted = _encode_buckets(buckets, "date", "key_as_string")
+        
+        return _encode_object(
+            {**_total_docs(result), **_truncation(omitted)},
+            {"timeline": timeline}
+        )
     
-    def _stats_aggregation(self, index: str, field: str, 
+    def _stats_aggregation(self, index: str, field: str, return_total: bool = False,
                           query: Dict = None) -> Dict[str, Any]:
         """Perform stats aggregation"""
+        return self._run_aggregation(*self._stats_request(index, field, return_total, query))
+    
+    def _stats_request(self, index: str, field: str, return_total: bool = False,
+                       query: Dict = None) -> AggregationRequest:
+        """Build stats aggregation request"""
         agg = {
             "statistics": self.query_builder.aggregation_stats(field)
         }
-        
-        result = self.es_tools.aggregate(index, agg, query)
-        
-        if "error" in result:
-            return result
-        
+        return index, agg, query, _search_options(return_total=return_total), self._format_stats
+    
+    @staticmethod
+    def _format_stats(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Format stats aggregation response"""
         stats = result["aggregations"]["statistics"]
         
         return {
-            "total_docs": result["hits"]["total"]["value"],
-            "statistics": {
-                "count": stats["count"],
-                "sum": stats["sum"],
-                "avg": stats["avg"],
-                "min": stats["min"],
-                "max": stats["max"]
-            }
+            **_total_docs(result),
+            "statistics": dict(zip(_STATS_FIELDS, _stats_values(stats)))
         }
     
     def _cardinality_aggregation(self, index: str, field: str, 
+                                 precision_threshold: int = None,
+                                 execution_hint: str = None,
+                                 terminate_after: int = None,
+                                 return_total: bool = False,
                                  query: Dict = None) -> Dict[str, Any]:
         """Count unique values"""
+        return self._run_aggregation(*self._cardinality_request(
+            index, field, precision_threshold, execution_hint, terminate_after, return_total, query
+        ))
+    
+    def _cardinality_request(self, index: str, field: str, 
+                             precision_threshold: int = None,
+                             execution_hint: str = None,
+                             terminate_after: int = None,
+                             return_total: bool = False,
+                             query: Dict = None) -> AggregationRequest:
+        """Build cardinality aggregation request"""
         agg = {
-            "unique_count": self.query_builder.aggregation_cardinality(field)
+            "unique_count": self.query_builder.aggregation_cardinality(
+                field, precision_threshold, execution_hint=execution_hint
+            )
         }
-        
-        result = self.es_tools.aggregate(index, agg, query)
-        
-        if "error" in result:
-            return result
-        
+        return index, agg, query, _search_options(terminate_after, return_total), self._format_cardinality
+    
+    @staticmethod
+    def _format_cardinality(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Format cardinality aggregation response"""
         return {
-            "total_docs": result["hits"]["total"]["value"],
+            **_total_docs(result),
             "unique_count": result["aggregations"]["unique_count"]["value"]
         }
     
     def _multi_aggregation(self, index: str, aggregations: List[Dict], 
-                          query: Dict = None) -> Dict[str, Any]:
+                          return_total: bool = False, query: Dict = None) -> Any:
         """Perform multiple aggregations"""
-        agg_dict = {}
-        
-        for agg_def in aggregations:
-            name = agg_def["name"]
-            agg_type = agg_def["type"]
-            field = agg_def["field"]
-            params = agg_def.get("params", {})
-            
-            if agg_type == "terms":
-                agg_dict[name] = self.query_builder.aggregation_terms(
-                    field, params.get("size", 10)
-                )
-            elif agg_type == "stats":
-                agg_dict[name] = self.query_builder.aggregation_stats(field)
-            elif agg_type == "avg":
-                agg_dict[name] = self.query_builder.aggregation_avg(field)
-            elif agg_type == "sum":
-                agg_dict[name] = self.query_builder.aggregation_sum(field)
-            elif agg_type == "cardinality":
-                agg_dict[name] = self.query_builder.aggregation_cardinality(field)
+        return self._run_aggregation(*self._multi_request(index, aggregations, return_total, query))
+    
+    def _multi_request(self, index: str, aggregations: List[Dict], 
+                       return_total: bool = False, query: Dict = None) -> AggregationRequest:
+        """Build multi aggregation request"""
+        # Sub-aggregations of unknown types are skipped
+        aggregations = [agg_def for agg_def in aggregations if agg_def["type"] in _AGG_BUILDERS]
         
-        result = self.es_tools.aggregate(index, agg_dict, query)
+        agg_dict = {
+            agg_def["name"]: _AGG_BUILDERS[agg_def["type"]](
+                self.query_builder, agg_def["field"], agg_def.get("params", {})
+            )
+            for agg_def in aggregations
+        }
+        type_by_name = {agg_def["name"]: agg_def["type"] for agg_def in aggregations}
         
-        if "error" in result:
-            return result
+        return index, agg_dict, query, _search_options(return_total=return_total), partial(self._format_multi, type_by_name)
+    
+    @staticmethod
+    def _format_multi(type_by_name: Dict[str, str], result: Dict[str, Any]) -> bytes:
+        """Format multi aggregation response as encoded JSON"""
+        aggregations = {}
+        omitted = 0
         
-        # Format all aggregation results
-        formatted_results = {
-            "total_docs": result["hits"]["total"]["value"],
-            "aggregations": {}
-        }
+        # Bucket aggregations share the size budget of a single tool response
+        bucket_aggs = sum(_AGG_FORMATTERS[agg_type] is _format_buckets for agg_type in type_by_name.values())
+        max_bytes = _MAX_BUCKET_BYTES // max(bucket_aggs, 1)
         
         for name, agg_result in result["aggregations"].items():
-            if "buckets" in agg_result:
-                formatted_results["aggregations"][name] = [
-                    {"value": b["key"], "count": b["doc_count"]}
-                    for b in agg_result["buckets"]
-                ]
-            elif "value" in agg_result:
-                formatted_results["aggregations"][name] = agg_result["value"]
-            else:
-                formatted_results["aggregations"][name] = agg_result
+            aggregations[name], agg_omitted = _AGG_FORMATTERS[type_by_name[name]](agg_result, max_bytes)
+            omitted += agg_omitted
         
-        return formatted_results
+        return _encode_object(
+            {**_total_docs(result), **_truncation(omitted)},
+            {"aggregations": _encode_object({}, aggregations)}
+        )
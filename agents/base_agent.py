@@ -1,21 +1,139 @@
 """
 Base agent class for all Elasticsearch agents
 """
-import json
-from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, FrozenSet, List, Tuple
+import orjson
 from openai import OpenAI
 from config.config import config
 from tools.elasticsearch_tools import ElasticsearchTools
 from tools.query_builder import QueryBuilder
+from utils.helpers import query_fingerprint
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__, "base_agent.log")
 
+_TOOL_CHOICE = "auto"
+_TRUNCATED_MARKER = "... [truncated]"
 
-class BaseAgent(ABC):
+# Turns whose tool results stay whole in the history; the model may still be
+# combining them with the results it asked for next
+_UNCOMPACTED_TURNS = 2
+
+# Room kept for the truncation flag added to a shrunk result
+_TRUNCATION_SLACK = 32
+
+# Placeholder for a value that does not fit at all
+_OMITTED = object()
+
+# Clients shared by every agent in the process, created on first use
+_OPENAI_CLIENT = None
+_ES_TOOLS = None
+_QB = None
+_CLIENTS_LOCK = Lock()
+
+
+def _dumps(data: Any, option: int = 0) -> str:
+    """Serialize data with orjson (the OpenAI SDK expects str content)"""
+    if isinstance(data, bytes):
+        # Tools may return results that are already JSON-encoded
+        return data.decode()
+    return orjson.dumps(data, option=option | orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _shrink(value: Any, budget: int) -> Any:
+    """
+    Keep the leading members and items of a decoded JSON value that fit in budget characters
+    
+    Containers are cut between elements and strings are shortened with a marker,
+    so the result still encodes to valid JSON.
+    
+    Returns:
+        The value itself if it fits, a shortened copy, or _OMITTED
+    """
+    if len(_dumps(value)) <= budget:
+        return value
+    
+    if isinstance(value, str):
+        keep = budget - 2 - len(_TRUNCATED_MARKER)
+        return value[:keep] + _TRUNCATED_MARKER if keep > 0 else _OMITTED
+    
+    if not isinstance(value, (dict, list)):
+        return _OMITTED
+    
+    is_dict = isinstance(value, dict)
+    kept = {} if is_dict else []
+    used = 2
+    
+    for key, item in (value.items() if is_dict else enumerate(value)):
+        # Room for the member key and the separating comma
+        prefix = len(_dumps(key)) + 1 if is_dict else 0
+        part = _shrink(item, budget - used - prefix - 1)
+        if part is _OMITTED:
+            break
+        
+        if is_dict:
+            kept[key] = part
+        else:
+            kept.append(part)
+        used += prefix + len(_dumps(part)) + 1
+        
+        if part is not item:
+            break
+    
+    return kept
+
+
+def _truncate_result(content: str, limit: int) -> str:
+    """Shorten an encoded tool result to about limit characters, keeping it valid JSON"""
+    try:
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return content[:limit] + _TRUNCATED_MARKER
+    
+    shrunk = _shrink(data, limit - _TRUNCATION_SLACK)
+    if isinstance(shrunk, dict):
+        shrunk["truncated"] = True
+    elif isinstance(shrunk, list):
+        shrunk.append(_TRUNCATED_MARKER)
+    elif shrunk is _OMITTED:
+        shrunk = {"truncated": True}
+    return _dumps(shrunk)
+
+
+def _call_signature(tool_name: str, arguments: Dict[str, Any]) -> bytes:
+    """Identify a tool call by its name and canonically encoded arguments"""
+    return query_fingerprint((tool_name, arguments))
+
+
+def _shared_clients() -> Tuple[OpenAI, ElasticsearchTools, QueryBuilder]:
+    """Return the process-wide OpenAI client, Elasticsearch tools and query builder"""
+    global _OPENAI_CLIENT, _ES_TOOLS, _QB
+    
+    if _QB is None:
+        with _CLIENTS_LOCK:
+            if _QB is None:
+                _OPENAI_CLIENT = OpenAI(api_key=config.openai.api_key)
+                _ES_TOOLS = ElasticsearchTools()
+                _QB = QueryBuilder()
+    
+    return _OPENAI_CLIENT, _ES_TOOLS, _QB
+
+
+class BaseAgent:
     """Base class for all agents"""
     
+    # Tools that only read state; repeated calls to them reuse earlier results
+    # until another tool changes something
+    read_only_tools: FrozenSet[str] = frozenset()
+    
+    # Whether the tool calls of one turn may run at the same time; agents whose
+    # calls depend on each other's effects run them one by one in order
+    concurrent_tools: bool = True
+    
     def __init__(self, name: str, role: str):
         """
         Initialize base agent
@@ -26,13 +144,10 @@ class BaseAgent(ABC):
         """
         self.name = name
         self.role = role
-        self.client = OpenAI(api_key=config.openai.api_key)
-        self.es_tools = ElasticsearchTools()
-        self.query_builder = QueryBuilder()
+        self.client, self.es_tools, self.query_builder = _shared_clients()
         
-        logger.info(f"Initialized {self.name} agent with role: {self.role}")
+        logger.info("Initialized %s agent with role: %s", self.name, self.role)
     
-    @abstractmethod
     def get_system_prompt(self) -> str:
         """
         Get the system prompt for this agent
@@ -40,9 +155,8 @@ class BaseAgent(ABC):
         Returns:
             System prompt string
         """
-        pass
+        raise NotImplementedError
     
-    @abstractmethod
     def get_tools_schema(self) -> List[Dict[str, Any]]:
         """
         Get the tools schema for function calling
@@ -50,9 +164,8 @@ class BaseAgent(ABC):
         Returns:
             List of tool definitions
         """
-        pass
+        raise NotImplementedError
     
-    @abstractmethod
     def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
         """
         Execute a tool with given arguments
@@ -64,7 +177,7 @@ class BaseAgent(ABC):
         Returns:
             Tool execution result
         """
-        pass
+        raise NotImplementedError
     
     def execute(self, user_query: str, max_iterations: int = 5) -> str:
         """
@@ -77,23 +190,32 @@ class BaseAgent(ABC):
         Returns:
             Final response
         """
-        logger.info(f"{self.name} executing query: {user_query}")
+        logger.info("%s executing query: %s", self.name, user_query)
         
         messages = [
             {"role": "system", "content": self.get_system_prompt()},
             {"role": "user", "content": user_query}
         ]
         
+        # Everything except the messages is identical for every request of this run
+        request_options = {
+            "model": config.openai.model,
+            "tools": self.get_tools_schema(),
+            "tool_choice": _TOOL_CHOICE,
+            "temperature": config.openai.temperature
+        }
+        
+        # Encoded results of the read-only tool calls made since the last
+        # state change, keyed by call signature
+        seen: Dict[bytes, str] = {}
+        
         for iteration in range(max_iterations):
-            logger.info(f"Iteration {iteration + 1}/{max_iterations}")
+            logger.debug("Iteration %d/%d", iteration + 1, max_iterations)
             
             try:
                 response = self.client.chat.completions.create(
-                    model=config.openai.model,
                     messages=messages,
-                    tools=self.get_tools_schema(),
-                    tool_choice="auto",
-                    temperature=config.openai.temperature
+                    **request_options
                 )
                 
                 response_message = response.choices[0].message
@@ -103,37 +225,171 @@ class BaseAgent(ABC):
                 if not response_message.tool_calls:
                     # No more tool calls, return final answer
                     final_response = response_message.content
-                    logger.info(f"{self.name} completed successfully")
+                    logger.info("%s completed successfully", self.name)
                     return final_response
                 
-                # Execute tool calls
-                for tool_call in response_message.tool_calls:
-                    tool_name = tool_call.function.name
-                    tool_args = json.loads(tool_call.function.arguments)
-                    
-                    logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-                    
-                    # Execute the tool
-                    tool_result = self.execute_tool(tool_name, tool_args)
-                    
+                tool_calls = response_message.tool_calls
+                calls = [
+                    (tool_call.function.name, orjson.loads(tool_call.function.arguments))
+                    for tool_call in tool_calls
+                ]
+                signatures = [_call_signature(tool_name, arguments) for tool_name, arguments in calls]
+                
+                if all(
+                    tool_name in self.read_only_tools and signature in seen
+                    for (tool_name, _), signature in zip(calls, signatures)
+                ):
+                    # The model is repeating itself, usually because the earlier
+                    # results were compacted out of sight, so hand them back in
+                    # full and make the next turn answer from them
+                    logger.warning("%s repeated its previous tool calls", self.name)
+                    contents = [seen[signature] for signature in signatures]
+                    request_options["tool_choice"] = "none"
+                else:
+                    contents = self._run_turn(calls, signatures, seen)
+                
+                # Results from older turns have already been acted on, so only
+                # a bounded part of them is re-sent with every later request
+                self._compact_tool_history(messages)
+                
+                for tool_call, (tool_name, _), content in zip(tool_calls, calls, contents):
                     # Add tool result to messages
                     messages.append({
                         "role": "tool",
                         "tool_call_id": tool_call.id,
                         "name": tool_name,
-                        "content": json.dumps(tool_result)
+                        "content": content
                     })
-                    
-                    logger.info(f"Tool {tool_name} executed successfully")
             
             except Exception as e:
-                error_msg = f"Error in {self.name}: {str(e)}"
-                logger.error(error_msg)
+                logger.error("Error in %s: %s", self.name, e)
                 return f"I encountered an error: {str(e)}"
         
-        logger.warning(f"{self.name} reached maximum iterations")
+        logger.warning("%s reached maximum iterations", self.name)
         return "I've reached the maximum number of steps. The task may be too complex or require clarification."
     
+    async def aexecute(self, user_query: str, max_iterations: int = 5) -> str:
+        """
+        Execute agent with user query from async code
+        
+        The run happens in a worker thread, so the event loop keeps serving
+        other queries while this one waits on OpenAI and Elasticsearch.
+        
+        Args:
+            user_query: User's natural language query
+            max_iterations: Maximum tool calling iterations
+            
+        Returns:
+            Final response
+        """
+        return await asyncio.to_thread(self.execute, user_query, max_iterations)
+    
+    def _run_turn(self, calls: List[Tuple[str, Dict[str, Any]]], signatures: List[bytes],
+                  seen: Dict[bytes, str]) -> List[str]:
+        """
+        Execute the tool calls of one turn, reusing results of repeated reads
+        
+        Args:
+            calls: List of (tool_name, arguments) pairs
+            signatures: Call signature of each call
+            seen: Encoded read-only results of earlier calls, updated in place
+            
+        Returns:
+            Encoded tool result for each call, in call order
+        """
+        contents: List[Any] = [None] * len(calls)
+        first_read: Dict[bytes, int] = {}
+        pending: Dict[int, Tuple[str, Dict[str, Any]]] = {}
+        
+        # Reads in a turn that also changes state must see the change, and
+        # anything read before it may be stale afterwards
+        changes_state = any(tool_name not in self.read_only_tools for tool_name, _ in calls)
+        if changes_state:
+            seen.clear()
+        
+        for i, (call, signature) in enumerate(zip(calls, signatures)):
+            if call[0] in self.read_only_tools:
+                if signature in seen:
+                    contents[i] = seen[signature]
+                    continue
+                if signature in first_read:
+                    # Repeated within this turn; filled in from the first call
+                    continue
+                first_read[signature] = i
+            pending[i] = call
+        
+        for i, result in zip(pending, self.execute_tools(list(pending.values()))):
+            contents[i] = _dumps(result)
+            if not changes_state and calls[i][0] in self.read_only_tools:
+                seen[signatures[i]] = contents[i]
+        
+        return [
+            content if content is not None else contents[first_read[signature]]
+            for content, signature in zip(contents, signatures)
+        ]
+    
+    def _compact_tool_history(self, messages: List[Any]) -> None:
+        """
+        Truncate tool results of older turns in the conversation history
+        
+        Called once the current turn's assistant message is in the history, so
+        the results of that turn and of the _UNCOMPACTED_TURNS before it stay whole.
+        
+        Args:
+            messages: Conversation messages, updated in place
+        """
+        limit = config.openai.history_tool_chars
+        if limit <= 0:
+            return
+        
+        # Assistant messages are SDK objects, every other message is a dict
+        turn_starts = [
+            i for i, message in enumerate(messages)
+            if not isinstance(message, dict) or message.get("role") == "assistant"
+        ]
+        if len(turn_starts) <= _UNCOMPACTED_TURNS:
+            return
+        
+        for message in messages[:turn_starts[-_UNCOMPACTED_TURNS - 1]]:
+            if not isinstance(message, dict) or message.get("role") != "tool":
+                continue
+            
+            content = message["content"]
+            if len(content) > limit:
+                message["content"] = _truncate_result(content, limit)
+    
+    def execute_tools(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """
+        Execute the tool calls of a single LLM turn, concurrently unless the
+        agent disables it
+        
+        Args:
+            calls: List of (tool_name, arguments) pairs
+            
+        Returns:
+            Tool results in the same order as calls
+        """
+        if len(calls) == 1 or not self.concurrent_tools:
+            return [self._run_tool(name, args) for name, args in calls]
+        
+        with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+            futures = [executor.submit(self._run_tool, name, args) for name, args in calls]
+            return [future.result() for future in futures]
+    
+    def _run_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """Execute a single tool, turning exceptions into error results"""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Executing tool: %s with args: %s", tool_name, arguments)
+        
+        try:
+            result = self.execute_tool(tool_name, arguments)
+        except Exception as e:
+            logger.error("Tool %s failed: %s", tool_name, e)
+            return {"error": str(e)}
+        
+        logger.info("Tool %s executed successfully", tool_name)
+        return result
+    
     def format_response(self, data: Any) -> str:
         """
         Format data for display
@@ -147,8 +403,10 @@ class BaseAgent(ABC):
         if isinstance(data, dict):
             if "error" in data:
                 return f"Error: {data['error']}"
-            return json.dumps(data, indent=2)
+            return _dumps(data, orjson.OPT_INDENT_2)
         elif isinstance(data, list):
-            return json.dumps(data, indent=2)
+            return _dumps(data, orjson.OPT_INDENT_2)
+        elif isinstance(data, bytes):
+            return _dumps(orjson.loads(data), orjson.OPT_INDENT_2)
         else:
             return str(data)
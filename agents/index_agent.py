@@ -1,22 +1,165 @@
 """
 Index management agent
 """
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 from agents.base_agent import BaseAgent
+from config.config import config
 from utils.helpers import sanitize_index_name
 
+# Index names repeat across tool calls, so sanitized names are memoized
+_sanitize_cached = lru_cache(maxsize=1024)(sanitize_index_name)
 
-class IndexAgent(BaseAgent):
-    """Agent specialized in index management"""
+# Index settings added to new indices unless the caller sets them
+_DEFAULT_INDEX_SETTINGS = {
+    name: value
+    for name, value in (
+        ("codec", config.index.codec),
+        ("refresh_interval", config.index.refresh_interval),
+        ("number_of_replicas", config.index.number_of_replicas)
+    )
+    if value
+}
+
+# Mapping for indices created without one: dynamically mapped strings get
+# text without norms plus the usual keyword sub-field
+_DEFAULT_MAPPINGS = {
+    "dynamic_templates": [
+        {
+            "strings": {
+                "match_mapping_type": "string",
+                "mapping": {
+                    "type": "text",
+                    "norms": False,
+                    "fields": {
+                        "keyword": {"type": "keyword", "ignore_above": 256}
+                    }
+                }
+            }
+        }
+    ]
+}
+
+
+# Date fields preferred as the index sort key, in order
+_SORT_FIELD_CANDIDATES = ("@timestamp", "timestamp", "created_at")
+
+
+def _has_nested(mapping: Any) -> bool:
+    """Check whether a mapping declares a nested field at any depth, dynamic templates included"""
+    if isinstance(mapping, dict):
+        return mapping.get("type") == "nested" or any(map(_has_nested, mapping.values()))
+    if isinstance(mapping, list):
+        return any(map(_has_nested, mapping))
+    return False
+
+
+def _index_sort_field(mappings: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Pick the top-level date field to sort a new index by, if there is one"""
+    # Elasticsearch rejects an index sort on indices with nested fields
+    if _has_nested(mappings):
+        return None
     
-    def __init__(self):
-        super().__init__(
-            name="IndexAgent",
-            role="Expert in managing Elasticsearch indices and documents"
-        )
+    properties = (mappings or {}).get("properties", {})
+    date_fields = [
+        name for name, prop in properties.items()
+        if isinstance(prop, dict) and prop.get("type") in ("date", "date_nanos")
+        and prop.get("doc_values", True)
+    ]
     
-    def get_system_prompt(self) -> str:
-        return """You are an expert Elasticsearch index management agent. Your role is to:
+    for name in _SORT_FIELD_CANDIDATES:
+        if name in date_fields:
+            return name
+    return date_fields[0] if date_fields else None
+
+
+def _apply_default_settings(settings: Optional[Dict[str, Any]],
+                            mappings: Optional[Dict[str, Any]] = None,
+                            enable_index_sort: bool = True) -> Dict[str, Any]:
+    """Add the default index settings the caller did not set (flat, dotted or nested)"""
+    settings = dict(settings or {})
+    index_settings = dict(settings.get("index", {}))
+    
+    def is_set(name: str) -> bool:
+        return name in settings or f"index.{name}" in settings or name in index_settings
+    
+    for name, value in _DEFAULT_INDEX_SETTINGS.items():
+        if not is_set(name):
+            index_settings[name] = value
+    
+    # Sorting segments newest-first by a date field keeps similar documents
+    # together (better compression) and lets sorted queries terminate early.
+    # The sort is fixed at creation and can only be changed by reindexing.
+    sort_field = _index_sort_field(mappings) if enable_index_sort else None
+    if sort_field and not is_set("sort") and not is_set("sort.field"):
+        index_settings["sort.field"] = [sort_field]
+        index_settings["sort.order"] = ["desc"]
+    
+    if index_settings:
+        settings["index"] = index_settings
+    return settings
+
+
+def _disable_text_norms(mapping: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a mapping with norms disabled on every text field that does not set them"""
+    mapping = dict(mapping)
+    
+    if mapping.get("type") == "text":
+        mapping.setdefault("norms", False)
+    
+    # Recurse into object properties and multi-fields
+    for key in ("properties", "fields"):
+        if isinstance(mapping.get(key), dict):
+            mapping[key] = {
+                name: _disable_text_norms(child) if isinstance(child, dict) else child
+                for name, child in mapping[key].items()
+            }
+    
+    return mapping
+
+
+def _mark_non_searchable(mappings: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """
+    Copy mappings with the given fields stored for display only
+    
+    Args:
+        mappings: Index mappings
+        fields: Field names, using dots for fields inside objects
+        
+    Returns:
+        Mappings where those fields are neither indexed nor kept as doc values
+    """
+    mappings = dict(mappings)
+    
+    for path in fields:
+        node = mappings
+        *parents, leaf = path.split(".")
+        
+        # Copy the objects along the path so the caller's mappings stay untouched
+        for name in parents:
+            child = node.get("properties", {}).get(name)
+            if not isinstance(child, dict):
+                break
+            child = dict(child)
+            node["properties"] = dict(node["properties"], **{name: child})
+            node = child
+        else:
+            prop = node.get("properties", {}).get(leaf)
+            if not isinstance(prop, dict) or "type" not in prop or prop["type"] in ("object", "nested"):
+                continue
+            
+            prop = dict(prop, index=False)
+            if prop["type"] == "text":
+                # Text fields have no doc values; drop their norms instead
+                prop["norms"] = False
+            else:
+                prop["doc_values"] = False
+            node["properties"] = dict(node["properties"], **{leaf: prop})
+    
+    return mappings
+
+
+_SYSTEM_PROMPT = """You are an expert Elasticsearch index management agent. Your role is to:
 1. Create and configure Elasticsearch indices
 2. Index, update, and delete documents
 3. Manage index settings and mappings
@@ -34,186 +177,246 @@ Available tools:
 Guidelines:
 - Always sanitize index names (lowercase, no special chars)
 - Suggest appropriate mappings based on data structure
+- Pass fields that are only displayed, never searched, sorted or aggregated, as
+  non_searchable_fields: they skip the inverted index and doc values, saving disk
+  and memory, but can no longer be queried without a reindex
 - Use bulk operations for multiple documents
 - Confirm destructive operations (delete)
 - Provide clear feedback on operation success/failure"""
-    
-    def get_tools_schema(self) -> List[Dict[str, Any]]:
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "create_index",
-                    "description": "Create a new Elasticsearch index",
-                    "parameters": {
+
+# Static tools schema, built once at import time and shared by all instances
+_TOOLS_SCHEMA = [
+    {
+        "type": "function",
+        "function": {
+            "name": "create_index",
+            "description": "Create a new Elasticsearch index",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name (will be sanitized)"
+                    },
+                    "mappings": {
                         "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name (will be sanitized)"
-                            },
-                            "mappings": {
-                                "type": "object",
-                                "description": "Index mappings defining field types"
-                            },
-                            "settings": {
-                                "type": "object",
-                                "description": "Index settings (shards, replicas, etc.)"
-                            }
-                        },
-                        "required": ["index"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "delete_index",
-                    "description": "Delete an Elasticsearch index",
-                    "parameters": {
+                        "description": "Index mappings defining field types"
+                    },
+                    "settings": {
                         "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name to delete"
-                            }
-                        },
-                        "required": ["index"]
+                        "description": "Index settings (shards, replicas, etc.)"
+                    },
+                    "non_searchable_fields": {
+                        "type": "array",
+                        "description": "Fields (dotted for nested objects) that are only displayed and never searched, sorted or aggregated",
+                        "items": {
+                            "type": "string"
+                        }
+                    },
+                    "enable_index_sort": {
+                        "type": "boolean",
+                        "description": "Sort the index newest-first by its date field (e.g. @timestamp) to save disk; cannot be changed after creation",
+                        "default": True
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "index_document",
-                    "description": "Index a single document",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            },
-                            "document": {
-                                "type": "object",
-                                "description": "Document to index"
-                            },
-                            "doc_id": {
-                                "type": "string",
-                                "description": "Optional document ID"
-                            }
-                        },
-                        "required": ["index", "document"]
+                },
+                "required": ["index"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "delete_index",
+            "description": "Delete an Elasticsearch index",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name to delete"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "bulk_index_documents",
-                    "description": "Index multiple documents at once",
-                    "parameters": {
+                },
+                "required": ["index"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "index_document",
+            "description": "Index a single document",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
+                    },
+                    "document": {
                         "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            },
-                            "documents": {
-                                "type": "array",
-                                "description": "Array of documents to index",
-                                "items": {
-                                    "type": "object"
-                                }
-                            }
-                        },
-                        "required": ["index", "documents"]
+                        "description": "Document to index"
+                    },
+                    "doc_id": {
+                        "type": "string",
+                        "description": "Optional document ID"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "update_document",
-                    "description": "Update an existing document",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            },
-                            "doc_id": {
-                                "type": "string",
-                                "description": "Document ID"
-                            },
-                            "update": {
-                                "type": "object",
-                                "description": "Fields to update"
-                            }
-                        },
-                        "required": ["index", "doc_id", "update"]
+                },
+                "required": ["index", "document"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "bulk_index_documents",
+            "description": "Index multiple documents at once",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
+                    },
+                    "documents": {
+                        "type": "array",
+                        "description": "Array of documents to index",
+                        "items": {
+                            "type": "object"
+                        }
+                    },
+                    "chunk_size": {
+                        "type": "integer",
+                        "description": "Documents sent per bulk request (tune for throughput)"
+                    },
+                    "max_chunk_bytes": {
+                        "type": "integer",
+                        "description": "Maximum size in bytes of a single bulk request"
+                    },
+                    "thread_count": {
+                        "type": "integer",
+                        "description": "Number of bulk requests sent concurrently (capped by the server configuration)"
+                    },
+                    "queue_size": {
+                        "type": "integer",
+                        "description": "Number of chunks prepared ahead of the sending threads (capped by the server configuration)"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "delete_document",
-                    "description": "Delete a document",
-                    "parameters": {
+                },
+                "required": ["index", "documents"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "update_document",
+            "description": "Update an existing document",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
+                    },
+                    "doc_id": {
+                        "type": "string",
+                        "description": "Document ID"
+                    },
+                    "update": {
                         "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            },
-                            "doc_id": {
-                                "type": "string",
-                                "description": "Document ID to delete"
-                            }
-                        },
-                        "required": ["index", "doc_id"]
+                        "description": "Fields to update"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_indices",
-                    "description": "List all available indices",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {}
+                },
+                "required": ["index", "doc_id", "update"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "delete_document",
+            "description": "Delete a document",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
+                    },
+                    "doc_id": {
+                        "type": "string",
+                        "description": "Document ID to delete"
                     }
-                }
+                },
+                "required": ["index", "doc_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "list_indices",
+            "description": "List all available indices",
+            "parameters": {
+                "type": "object",
+                "properties": {}
             }
-        ]
+        }
+    }
+]
+
+
+class IndexAgent(BaseAgent):
+    """Agent specialized in index management"""
+    
+    read_only_tools = frozenset(("list_indices",))
+    
+    # Writes depend on order: a document write would auto-create an index
+    # that a create_index earlier in the same turn is meant to define
+    concurrent_tools = False
+    
+    def __init__(self):
+        super().__init__(
+            name="IndexAgent",
+            role="Expert in managing Elasticsearch indices and documents"
+        )
+        
+        self._dispatch = {
+            "create_index": self._create_index,
+            "delete_index": self._delete_index,
+            "index_document": self._index_document,
+            "bulk_index_documents": self._bulk_index_documents,
+            "update_document": self._update_document,
+            "delete_document": self._delete_document,
+            "list_indices": lambda **_: self._list_indices()
+        }
+    
+    def get_system_prompt(self) -> str:
+        return _SYSTEM_PROMPT
+    
+    def get_tools_schema(self) -> List[Dict[str, Any]]:
+        return _TOOLS_SCHEMA
     
     def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
         """Execute index management tools"""
         
-        if tool_name == "create_index":
-            return self._create_index(**arguments)
-        elif tool_name == "delete_index":
-            return self._delete_index(**arguments)
-        elif tool_name == "index_document":
-            return self._index_document(**arguments)
-        elif tool_name == "bulk_index_documents":
-            return self._bulk_index_documents(**arguments)
-        elif tool_name == "update_document":
-            return self._update_document(**arguments)
-        elif tool_name == "delete_document":
-            return self._delete_document(**arguments)
-        elif tool_name == "list_indices":
-            return self._list_indices()
-        else:
+        handler = self._dispatch.get(tool_name)
+        if handler is None:
             return {"error": f"Unknown tool: {tool_name}"}
+        return handler(**arguments)
     
     def _create_index(self, index: str, mappings: Dict = None, 
-                     settings: Dict = None) -> Dict[str, Any]:
+                     settings: Dict = None,
+                     non_searchable_fields: List[str] = None,
+                     enable_index_sort: bool = True) -> Dict[str, Any]:
         """Create an index"""
-        sanitized_name = sanitize_index_name(index)
+        sanitized_name = _sanitize_cached(index)
+        
+        if mappings and non_searchable_fields:
+            mappings = _mark_non_searchable(mappings, non_searchable_fields)
+        if config.index.disable_text_norms:
+            mappings = _disable_text_norms(mappings) if mappings else _DEFAULT_MAPPINGS
+        settings = _apply_default_settings(settings, mappings, enable_index_sort)
+        
         result = self.es_tools.create_index(sanitized_name, mappings, settings)
         
         if "error" in result:
@@ -252,21 +455,31 @@ Guidelines:
             "message": f"Document indexed successfully with ID: {result['_id']}"
         }
     
-    def _bulk_index_documents(self, index: str, 
-                             documents: List[Dict]) -> Dict[str, Any]:
+    def _bulk_index_documents(self, index: str, documents: List[Dict],
+                             chunk_size: int = None,
+                             max_chunk_bytes: int = None,
+                             thread_count: int = None,
+                             queue_size: int = None) -> Dict[str, Any]:
         """Bulk index documents"""
-        result = self.es_tools.bulk_index(index, documents)
+        result = self.es_tools.bulk_index(
+            index, documents, chunk_size, max_chunk_bytes, thread_count, queue_size
+        )
         
         if "error" in result:
             return result
         
-        return {
+        response = {
             "success": True,
             "total": result["total"],
             "indexed": result["success"],
             "failed": result["failed"],
+            "errors": result["errors"],
             "message": f"Indexed {result['success']} documents successfully"
         }
+        if "capped" in result:
+            # Requested thread_count/queue_size above the configured limits
+            response["capped"] = result["capped"]
+        return response
     
     def _update_document(self, index: str, doc_id: str, 
                         update: Dict) -> Dict[str, Any]:
@@ -1,22 +1,25 @@
 """
 Search agent for natural language search queries
 """
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from agents.base_agent import BaseAgent
+from config.config import config
 from utils.helpers import format_es_response
 
+# Response parts used to build search results, so Elasticsearch trims the rest
+_SEARCH_FILTER_PATH = "hits.total,hits.hits._id,hits.hits._score,hits.hits._source"
 
-class SearchAgent(BaseAgent):
-    """Agent specialized in searching Elasticsearch"""
-    
-    def __init__(self):
-        super().__init__(
-            name="SearchAgent",
-            role="Expert in searching and retrieving data from Elasticsearch indices"
-        )
-    
-    def get_system_prompt(self) -> str:
-        return """You are an expert Elasticsearch search agent. Your role is to:
+# Common text fields searched by multi_match queries unless configured otherwise
+_MULTI_MATCH_FIELDS = ("title", "description", "content", "name", "text")
+
+# Exact-match query types that never need scoring, so they run in filter context
+_FILTER_QUERY_TYPES = frozenset(("term", "range", "prefix"))
+
+# Position of each bool clause in the (must, should, must_not) lists
+_CLAUSE_INDEX = {"must": 0, "should": 1, "must_not": 2}
+
+
+_SYSTEM_PROMPT = """You are an expert Elasticsearch search agent. Your role is to:
 1. Understand user's natural language search queries
 2. Convert them into appropriate Elasticsearch queries
 3. Execute searches and return results
@@ -34,150 +37,156 @@ Guidelines:
 - For date ranges, use range queries with appropriate date math
 - Combine multiple conditions using bool queries
 - Return clear, concise summaries of search results"""
-    
-    def get_tools_schema(self) -> List[Dict[str, Any]]:
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_documents",
-                    "description": "Search for documents in an Elasticsearch index using a query",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "The name of the index to search"
-                            },
-                            "query_type": {
-                                "type": "string",
-                                "enum": ["match", "term", "range", "bool", "multi_match", "wildcard", "prefix"],
-                                "description": "Type of query to execute"
-                            },
-                            "field": {
-                                "type": "string",
-                                "description": "Field name to search (for match, term, range queries)"
-                            },
-                            "value": {
-                                "type": "string",
-                                "description": "Value to search for"
-                            },
-                            "size": {
-                                "type": "integer",
-                                "description": "Number of results to return",
-                                "default": 10
-                            },
-                            "conditions": {
-                                "type": "array",
-                                "description": "For bool queries: array of conditions with 'clause' (must/should/must_not), 'query_type', 'field', 'value'",
-                                "items": {
-                                    "type": "object"
-                                }
-                            }
-                        },
-                        "required": ["index", "query_type"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_indices",
-                    "description": "List all available Elasticsearch indices",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {}
+
+# Static tools schema, built once at import time and shared by all instances
+_TOOLS_SCHEMA = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_documents",
+            "description": "Search for documents in an Elasticsearch index using a query",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "The name of the index to search"
+                    },
+                    "query_type": {
+                        "type": "string",
+                        "enum": ["match", "term", "range", "bool", "multi_match", "wildcard", "prefix"],
+                        "description": "Type of query to execute"
+                    },
+                    "field": {
+                        "type": "string",
+                        "description": "Field name to search (for match, term, range queries)"
+                    },
+                    "value": {
+                        "type": "string",
+                        "description": "Value to search for"
+                    },
+                    "size": {
+                        "type": "integer",
+                        "description": "Number of results to return",
+                        "default": 10
+                    },
+                    "fields": {
+                        "type": "array",
+                        "description": "Only return these document fields (omit to return whole documents)",
+                        "items": {
+                            "type": "string"
+                        }
+                    },
+                    "conditions": {
+                        "type": "array",
+                        "description": "For bool queries: array of conditions with 'clause' (must/should/must_not), 'query_type', 'field', 'value'",
+                        "items": {
+                            "type": "object"
+                        }
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_index_info",
-                    "description": "Get detailed information about an index including mappings and stats",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "index": {
-                                "type": "string",
-                                "description": "Index name"
-                            }
-                        },
-                        "required": ["index"]
+                },
+                "required": ["index", "query_type"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "list_indices",
+            "description": "List all available Elasticsearch indices",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_index_info",
+            "description": "Get detailed information about an index including mappings and stats",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "string",
+                        "description": "Index name"
                     }
-                }
+                },
+                "required": ["index"]
             }
-        ]
+        }
+    }
+]
+
+
+class SearchAgent(BaseAgent):
+    """Agent specialized in searching Elasticsearch"""
+    
+    read_only_tools = frozenset(("search_documents", "list_indices", "get_index_info"))
+    
+    def __init__(self):
+        super().__init__(
+            name="SearchAgent",
+            role="Expert in searching and retrieving data from Elasticsearch indices"
+        )
+        
+        self._dispatch = {
+            "search_documents": self._search_documents,
+            "list_indices": lambda **_: self._list_indices(),
+            "get_index_info": self._get_index_info
+        }
+        
+        self._mm_fields = config.search.multi_match_fields or _MULTI_MATCH_FIELDS
+        
+        # Query builders by query_type, returning None when the arguments they
+        # need are missing so the search falls back to match_all
+        qb = self.query_builder
+        self._query_builders = {
+            "match": lambda field, value, conditions: qb.match(field, value) if field and value else None,
+            "term": lambda field, value, conditions: qb.term(field, value) if field and value else None,
+            "range": lambda field, value, conditions: qb.date_range_from_text(field, value or "") if field else None,
+            "multi_match": lambda field, value, conditions: qb.multi_match(value, self._mm_fields) if value else None,
+            "wildcard": lambda field, value, conditions: qb.wildcard(field, value) if field and value else None,
+            "prefix": lambda field, value, conditions: qb.prefix(field, value) if field and value else None,
+            "bool": self._build_bool_query
+        }
+        
+        # Query builders for the conditions of a bool query
+        self._condition_builders = {
+            "match": self.query_builder.match,
+            "term": self.query_builder.term
+        }
+    
+    def get_system_prompt(self) -> str:
+        return _SYSTEM_PROMPT
+    
+    def get_tools_schema(self) -> List[Dict[str, Any]]:
+        return _TOOLS_SCHEMA
     
     def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
         """Execute search tools"""
         
-        if tool_name == "search_documents":
-            return self._search_documents(**arguments)
-        elif tool_name == "list_indices":
-            return self._list_indices()
-        elif tool_name == "get_index_info":
-            return self._get_index_info(**arguments)
-        else:
+        handler = self._dispatch.get(tool_name)
+        if handler is None:
             return {"error": f"Unknown tool: {tool_name}"}
+        return handler(**arguments)
     
     def _search_documents(self, index: str, query_type: str, 
                          field: str = None, value: str = None,
-                         size: int = 10, conditions: List[Dict] = None) -> Dict[str, Any]:
+                         size: int = 10, fields: List[str] = None,
+                         conditions: List[Dict] = None) -> Dict[str, Any]:
         """Build and execute search query"""
         
         # Build query based on type
-        if query_type == "match" and field and value:
-            query = self.query_builder.match(field, value)
-        elif query_type == "term" and field and value:
-            query = self.query_builder.term(field, value)
-        elif query_type == "range" and field:
-            # Parse range parameters from value
-            query = self.query_builder.date_range_from_text(field, value or "")
-        elif query_type == "multi_match" and value:
-            # Use common fields for multi-match
-            fields = ["title", "description", "content", "name", "text"]
-            query = self.query_builder.multi_match(value, fields)
-        elif query_type == "wildcard" and field and value:
-            query = self.query_builder.wildcard(field, value)
-        elif query_type == "prefix" and field and value:
-            query = self.query_builder.prefix(field, value)
-        elif query_type == "bool" and conditions:
-            # Build bool query from conditions
-            must = []
-            should = []
-            must_not = []
-            
-            for cond in conditions:
-                clause = cond.get("clause", "must")
-                cond_type = cond.get("query_type")
-                cond_field = cond.get("field")
-                cond_value = cond.get("value")
-                
-                if cond_type == "match":
-                    sub_query = self.query_builder.match(cond_field, cond_value)
-                elif cond_type == "term":
-                    sub_query = self.query_builder.term(cond_field, cond_value)
-                else:
-                    continue
-                
-                if clause == "must":
-                    must.append(sub_query)
-                elif clause == "should":
-                    should.append(sub_query)
-                elif clause == "must_not":
-                    must_not.append(sub_query)
-            
-            query = self.query_builder.bool_query(
-                must=must if must else None,
-                should=should if should else None,
-                must_not=must_not if must_not else None
-            )
-        else:
-            query = self.query_builder.match_all()
+        builder = self._query_builders.get(query_type)
+        query = (builder(field, value, conditions) if builder else None) or self.query_builder.match_all()
         
         # Execute search
-        result = self.es_tools.search(index, query, size)
+        result = self.es_tools.search(
+            index, query, size, source_includes=fields, filter_path=_SEARCH_FILTER_PATH,
+            filter_only=query_type in _FILTER_QUERY_TYPES
+        )
         
         # Format result for LLM consumption
         if "error" in result:
@@ -189,12 +198,36 @@ Guidelines:
                 {
                     "id": hit["_id"],
                     "score": hit["_score"],
-                    "source": hit["_source"]
+                    "source": hit.get("_source", {})
                 }
-                for hit in result["hits"]["hits"]
+                # filter_path drops hits.hits entirely when nothing matched
+                for hit in result["hits"].get("hits", [])
             ]
         }
     
+    def _build_bool_query(self, field: str, value: str,
+                          conditions: List[Dict]) -> Optional[Dict[str, Any]]:
+        """Build bool query from conditions"""
+        if not conditions:
+            return None
+        
+        clauses = ([], [], [])
+        
+        for cond in conditions:
+            builder = self._condition_builders.get(cond.get("query_type"))
+            clause = _CLAUSE_INDEX.get(cond.get("clause", "must"))
+            if builder is None or clause is None:
+                continue
+            
+            clauses[clause].append(builder(cond.get("field"), cond.get("value")))
+        
+        must, should, must_not = clauses
+        return self.query_builder.bool_query(
+            must=must or None,
+            should=should or None,
+            must_not=must_not or None
+        )
+    
     def _list_indices(self) -> Dict[str, Any]:
         """List all indices"""
         indices = self.es_tools.list_indices()
@@ -208,11 +241,11 @@ Guidelines:
             return info
         
         # Simplify the response
-        index_data = list(info["mappings"].values())[0]
+        index_data = next(iter(info["mappings"].values()), {})
         properties = index_data.get("mappings", {}).get("properties", {})
         
         return {
             "index": index,
-            "fields": list(properties.keys()),
+            "fields": tuple(properties),
             "document_count": info["stats"]["_all"]["primaries"]["docs"]["count"]
         }
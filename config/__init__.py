@@ -1,5 +1,5 @@
 """Configuration module for Elasticsearch Agent"""
-from .config import config, AppConfig, ElasticsearchConfig, OpenAIConfig
+from .config import config, get_es_client, get_async_es_client, AppConfig, ElasticsearchConfig, OpenAIConfig, IndexConfig, SearchConfig
 
-__all__ = ['config', 'AppConfig', 'ElasticsearchConfig', 'OpenAIConfig']
+__all__ = ['config', 'get_es_client', 'get_async_es_client', 'AppConfig', 'ElasticsearchConfig', 'OpenAIConfig', 'IndexConfig', 'SearchConfig']
 
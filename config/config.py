@@ -2,14 +2,16 @@
 Configuration management for Elasticsearch Agent
 """
 import os
-from typing import Optional
-from pydantic import BaseModel
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-class ElasticsearchConfig(BaseModel):
+@dataclass(slots=True, frozen=True)
+class ElasticsearchConfig:
     """Elasticsearch configuration"""
     host: str = os.getenv("ELASTICSEARCH_HOST", "localhost")
     port: int = int(os.getenv("ELASTICSEARCH_PORT", "9200"))
@@ -17,6 +19,24 @@ class ElasticsearchConfig(BaseModel):
     password: Optional[str] = os.getenv("ELASTICSEARCH_PASSWORD")
     scheme: str = os.getenv("ELASTICSEARCH_SCHEME", "http")
     verify_certs: bool = os.getenv("ELASTICSEARCH_VERIFY_CERTS", "False").lower() == "true"
+    # gzip request and response bodies (large aggregation responses compress well)
+    http_compress: bool = os.getenv("ELASTICSEARCH_HTTP_COMPRESS", "True").lower() == "true"
+    # Encode and decode request/response bodies with orjson instead of json
+    orjson_serializer: bool = os.getenv("ELASTICSEARCH_ORJSON_SERIALIZER", "True").lower() == "true"
+    # Keep-alive connections kept open per node, sized for concurrent tool calls and bulk threads
+    pool_size: int = int(os.getenv("ELASTICSEARCH_POOL_SIZE", "25"))
+    # Discover the other cluster nodes on start-up (needs publish addresses reachable from here)
+    sniff: bool = os.getenv("ELASTICSEARCH_SNIFF", "False").lower() == "true"
+    # Documents and bytes sent per _bulk request when streaming bulk ingests
+    # (a chunk size of 0 derives it from the sampled document size)
+    bulk_chunk_size: int = int(os.getenv("ELASTICSEARCH_BULK_CHUNK_SIZE", "0"))
+    bulk_max_chunk_bytes: int = int(os.getenv("ELASTICSEARCH_BULK_MAX_CHUNK_BYTES", str(10 * 1024 * 1024)))
+    # Threads sending bulk chunks concurrently (they release the GIL while waiting on sockets)
+    bulk_thread_count: int = int(os.getenv(
+        "ELASTICSEARCH_BULK_THREAD_COUNT", str(min(12, (os.cpu_count() or 1) * 3))
+    ))
+    # Chunks prepared ahead of the bulk threads
+    bulk_queue_size: int = int(os.getenv("ELASTICSEARCH_BULK_QUEUE_SIZE", "4"))
     
     @property
     def url(self) -> str:
@@ -24,25 +44,119 @@ class ElasticsearchConfig(BaseModel):
         if self.user and self.password:
             return f"{self.scheme}://{self.user}:{self.password}@{self.host}:{self.port}"
         return f"{self.scheme}://{self.host}:{self.port}"
+    
+    @property
+    def urls(self) -> List[str]:
+        """Get the URL of every configured node (ELASTICSEARCH_HOST may list several)"""
+        credentials = f"{self.user}:{self.password}@" if self.user and self.password else ""
+        return [
+            f"{self.scheme}://{credentials}{host.strip()}:{self.port}"
+            for host in self.host.split(",")
+        ]
 
 
-class OpenAIConfig(BaseModel):
+@dataclass(slots=True, frozen=True)
+class OpenAIConfig:
     """OpenAI configuration"""
     api_key: str = os.getenv("OPENAI_API_KEY", "")
     model: str = os.getenv("OPENAI_MODEL", "gpt-4-turbo-preview")
     temperature: float = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
     max_tokens: int = int(os.getenv("OPENAI_MAX_TOKENS", "2000"))
+    # Characters of older tool results re-sent on later turns (0 keeps them whole);
+    # the results of the last few turns are always re-sent whole
+    history_tool_chars: int = int(os.getenv("OPENAI_HISTORY_TOOL_CHARS", "0"))
+
+
+@dataclass(slots=True, frozen=True)
+class IndexConfig:
+    """Defaults applied to new indices unless the caller sets them (empty disables one)"""
+    # best_compression trades a little indexing CPU for noticeably smaller segments
+    codec: str = os.getenv("INDEX_CODEC", "best_compression")
+    # Unset keeps new documents searchable within a second; a longer interval such
+    # as 30s speeds up heavy ingest but delays search results by as much
+    refresh_interval: str = os.getenv("INDEX_REFRESH_INTERVAL", "")
+    number_of_replicas: str = os.getenv("INDEX_NUMBER_OF_REPLICAS", "1")
+    # Norms only feed relevance length normalization; dropping them saves disk and heap
+    disable_text_norms: bool = os.getenv("INDEX_DISABLE_TEXT_NORMS", "True").lower() == "true"
+
 
+@dataclass(slots=True, frozen=True)
+class SearchConfig:
+    """Search configuration"""
+    # Comma-separated fields searched by multi_match queries (empty uses the built-in list)
+    multi_match_fields: Tuple[str, ...] = tuple(
+        name.strip() for name in os.getenv("SEARCH_MULTI_MATCH_FIELDS", "").split(",") if name.strip()
+    )
 
-class AppConfig(BaseModel):
+
+@dataclass(slots=True, frozen=True)
+class AppConfig:
     """Application configuration"""
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
     max_retries: int = int(os.getenv("MAX_RETRIES", "3"))
     timeout: int = int(os.getenv("TIMEOUT", "30"))
+    # Seconds the index list is reused before asking the cluster again (0 disables)
+    list_indices_ttl: float = float(os.getenv("LIST_INDICES_TTL", "5"))
+    # Search responses reused for identical requests (0 disables)
+    result_cache_size: int = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+    result_cache_ttl: float = float(os.getenv("RESULT_CACHE_TTL", "60"))
     
-    elasticsearch: ElasticsearchConfig = ElasticsearchConfig()
-    openai: OpenAIConfig = OpenAIConfig()
+    elasticsearch: ElasticsearchConfig = field(default_factory=ElasticsearchConfig)
+    openai: OpenAIConfig = field(default_factory=OpenAIConfig)
+    index: IndexConfig = field(default_factory=IndexConfig)
+    search: SearchConfig = field(default_factory=SearchConfig)
 
 
 # Global config instance
 config = AppConfig()
+
+
+def _es_client_options() -> Dict[str, Any]:
+    """Build the connection options shared by the sync and async clients"""
+    from tools.serializers import CompatibilityModeOrjsonSerializer, OrjsonSerializer
+    
+    es = config.elasticsearch
+    
+    # Responses come back with the compatibility-mode mimetype, so orjson has
+    # to be registered for it as well as for plain JSON request bodies
+    serializers = {
+        serializer.mimetype: serializer
+        for serializer in (OrjsonSerializer(), CompatibilityModeOrjsonSerializer())
+    } if es.orjson_serializer else {}
+    
+    # Requests are load-balanced round-robin across the configured nodes
+    return {
+        "hosts": es.urls,
+        "verify_certs": es.verify_certs,
+        "http_compress": es.http_compress,
+        "serializers": serializers,
+        # Every parallel_bulk thread needs its own connection on top of the
+        # ones used by concurrent tool calls
+        "connections_per_node": max(es.pool_size, es.bulk_thread_count),
+        "max_retries": config.max_retries,
+        "retry_on_timeout": True,
+        "sniff_on_start": es.sniff,
+        "sniff_on_node_failure": es.sniff,
+        "request_timeout": config.timeout
+    }
+
+
+@lru_cache(maxsize=1)
+def get_es_client() -> Any:
+    """Get the process-wide pooled Elasticsearch client, created on first use"""
+    from elasticsearch import Elasticsearch
+    
+    return Elasticsearch(**_es_client_options())
+
+
+@lru_cache(maxsize=1)
+def get_async_es_client() -> Any:
+    """
+    Get the process-wide AsyncElasticsearch client, created on first use
+    
+    The client binds to the event loop that sends its first request, so it
+    should only be used from one loop. Requires the elasticsearch[async] extra.
+    """
+    from elasticsearch import AsyncElasticsearch
+    
+    return AsyncElasticsearch(**_es_client_options())
@@ -1,27 +1,91 @@
 """
 Main application entry point for Elasticsearch Agentic AI
 """
+import re
 import sys
-from agents.search_agent import SearchAgent
-from agents.index_agent import IndexAgent
-from agents.analytics_agent import AnalyticsAgent
+from functools import cached_property
+from typing import TYPE_CHECKING, Callable, Tuple
 from utils.logger import setup_logger
 
+if TYPE_CHECKING:
+    from agents.base_agent import BaseAgent
+
 logger = setup_logger(__name__, "main.log")
 
+# Index management keywords
+_INDEX_KEYWORDS = (
+    "create index", "delete index", "index document", 
+    "bulk index", "update document", "delete document",
+    "add data", "insert", "remove", "modify"
+)
+
+# Analytics keywords
+_ANALYTICS_KEYWORDS = (
+    "analyze", "statistics", "average", "sum", "count",
+    "top", "histogram", "trend", "distribution",
+    "how many", "what is the", "calculate", "aggregate"
+)
+
+
+def _build_router(index_keywords: Tuple[str, ...],
+                  analytics_keywords: Tuple[str, ...]) -> Callable[[str], str]:
+    """
+    Compile routing keywords into a query classifier
+    
+    Each agent's keywords become one alternation, so a query is scanned once
+    per agent instead of once per keyword. Keywords match anywhere in the
+    query (no word boundaries) and index keywords take priority.
+    
+    Args:
+        index_keywords: Keywords routed to the index agent
+        analytics_keywords: Keywords routed to the analytics agent
+        
+    Returns:
+        Function mapping a lowercase query to "index", "analytics" or "search"
+    """
+    index_search = re.compile("|".join(map(re.escape, index_keywords))).search
+    analytics_search = re.compile("|".join(map(re.escape, analytics_keywords))).search
+    
+    def classify(query_lower: str) -> str:
+        if index_search(query_lower):
+            return "index"
+        if analytics_search(query_lower):
+            return "analytics"
+        return "search"
+    
+    return classify
+
+
+# Built once per process; extend the keyword tuples above to change routing
+_ROUTE = _build_router(_INDEX_KEYWORDS, _ANALYTICS_KEYWORDS)
+
 
 class ElasticsearchAgentSystem:
     """Main system for orchestrating Elasticsearch agents"""
     
     def __init__(self):
-        """Initialize all agents"""
+        """Initialize the system; agents are created on first use"""
         logger.info("Initializing Elasticsearch Agent System")
-        
-        self.search_agent = SearchAgent()
-        self.index_agent = IndexAgent()
-        self.analytics_agent = AnalyticsAgent()
-        
-        logger.info("All agents initialized successfully")
+    
+    # The agent modules pull in the OpenAI and Elasticsearch clients, so they
+    # are only imported once a query actually needs an agent
+    @cached_property
+    def search_agent(self) -> "BaseAgent":
+        """Agent for search queries"""
+        from agents.search_agent import SearchAgent
+        return SearchAgent()
+    
+    @cached_property
+    def index_agent(self) -> "BaseAgent":
+        """Agent for index management"""
+        from agents.index_agent import IndexAgent
+        return IndexAgent()
+    
+    @cached_property
+    def analytics_agent(self) -> "BaseAgent":
+        """Agent for aggregations and analytics"""
+        from agents.analytics_agent import AnalyticsAgent
+        return AnalyticsAgent()
     
     def route_query(self, query: str) -> str:
         """
@@ -33,32 +97,25 @@ class ElasticsearchAgentSystem:
         Returns:
             Agent response
         """
-        query_lower = query.lower()
-        
-        # Index management keywords
-        index_keywords = [
-            "create index", "delete index", "index document", 
-            "bulk index", "update document", "delete document",
-            "add data", "insert", "remove", "modify"
-        ]
-        
-        # Analytics keywords
-        analytics_keywords = [
-            "analyze", "statistics", "average", "sum", "count",
-            "top", "histogram", "trend", "distribution",
-            "how many", "what is the", "calculate", "aggregate"
-        ]
+        return self._select_agent(query).execute(query)
+    
+    async def aroute_query(self, query: str) -> str:
+        """
+        Route query to appropriate agent without blocking the event loop
         
-        # Route to appropriate agent
-        if any(keyword in query_lower for keyword in index_keywords):
-            logger.info("Routing to IndexAgent")
-            return self.index_agent.execute(query)
-        elif any(keyword in query_lower for keyword in analytics_keywords):
-            logger.info("Routing to AnalyticsAgent")
-            return self.analytics_agent.execute(query)
-        else:
-            logger.info("Routing to SearchAgent")
-            return self.search_agent.execute(query)
+        Args:
+            query: User query
+            
+        Returns:
+            Agent response
+        """
+        return await self._select_agent(query).aexecute(query)
+    
+    def _select_agent(self, query: str) -> "BaseAgent":
+        """Pick the agent whose keywords match the query"""
+        agent = getattr(self, f"{_ROUTE(query.lower())}_agent")
+        logger.info("Routing to %s", agent.name)
+        return agent
     
     def interactive_mode(self):
         """Run in interactive mode"""
@@ -86,16 +143,16 @@ class ElasticsearchAgentSystem:
                     self._show_examples()
                     continue
                 
-                print("\nAgent: ", end="", flush=True)
+                # Emit the whole answer in one write instead of several prints
                 response = self.route_query(query)
-                print(response)
-                print()
+                sys.stdout.write(f"\nAgent: {response}\n\n")
+                sys.stdout.flush()
                 
             except KeyboardInterrupt:
                 print("\n\nGoodbye!")
                 break
             except Exception as e:
-                logger.error(f"Error in interactive mode: {e}")
+                logger.error("Error in interactive mode: %s", e)
                 print(f"\nError: {e}\n")
     
     def _show_examples(self):
@@ -120,6 +177,10 @@ class ElasticsearchAgentSystem:
 
 def main():
     """Main function"""
+    # Keep the Windows console responsive now that answers are written in one go
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(line_buffering=True)
+    
     try:
         # Initialize system
         system = ElasticsearchAgentSystem()
@@ -127,7 +188,7 @@ def main():
         # Check if query provided as command line argument
         if len(sys.argv) > 1:
             query = " ".join(sys.argv[1:])
-            logger.info(f"Processing query: {query}")
+            logger.info("Processing query: %s", query)
             response = system.route_query(query)
             print(response)
         else:
@@ -135,7 +196,7 @@ def main():
             system.interactive_mode()
     
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
+        logger.exception("Fatal error")
         print(f"Error: {e}")
         sys.exit(1)
 
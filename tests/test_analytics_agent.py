@@ -0,0 +1,49 @@
+"""
+Tests for the zero-match short-circuit of AnalyticsAgent
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+from agents import base_agent
+from agents.analytics_agent import AnalyticsAgent
+from tools.query_builder import QueryBuilder
+
+_CALLS = [
+    ("terms_aggregation", {"index": "orders", "field": "country", "query": {"term": {"status": "lost"}}}),
+    ("stats_aggregation", {"index": "orders", "field": "total", "query": {"term": {"status": "lost"}}})
+]
+
+
+def _agent(es_tools: MagicMock) -> AnalyticsAgent:
+    """Build an agent on top of mocked Elasticsearch tools"""
+    with patch.object(base_agent, "_shared_clients", return_value=(MagicMock(), es_tools, QueryBuilder())):
+        return AnalyticsAgent()
+
+
+class TestZeroMatchAggregations(unittest.TestCase):
+    
+    def test_single_and_batched_calls_agree(self):
+        single_tools = MagicMock()
+        single_tools.count.return_value = 0
+        single = _agent(single_tools)
+        expected = [single.execute_tool(name, arguments) for name, arguments in _CALLS]
+        single_tools.aggregate.assert_not_called()
+        
+        batched_tools = MagicMock()
+        batched_tools.msearch.return_value = [
+            {"hits": {"total": {"value": 0}}},
+            {"hits": {}, "aggregations": {"top_terms": {"sum_other_doc_count": 0, "buckets": []}}},
+            {"hits": {}, "aggregations": {"statistics": {"count": 0, "sum": 0.0}}}
+        ]
+        batched = _agent(batched_tools)
+        
+        self.assertEqual(batched.execute_tools(_CALLS), expected)
+        batched_tools.count.assert_not_called()
+        
+        # The shared filter query is probed once, ahead of both aggregations
+        searches = batched_tools.msearch.call_args.args[0]
+        self.assertEqual(len(searches), 3)
+        self.assertTrue(searches[0][1]["track_total_hits"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Tests for the tool calling loop of BaseAgent
+"""
+import dataclasses
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import orjson
+from agents import base_agent
+from agents.base_agent import BaseAgent, _truncate_result
+from config.config import config
+
+
+def _tool_call(call_id: str, name: str, arguments: dict) -> SimpleNamespace:
+    """Build a tool call as returned by the OpenAI SDK"""
+    return SimpleNamespace(
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=orjson.dumps(arguments).decode())
+    )
+
+
+def _completion(tool_calls=None, content=None) -> SimpleNamespace:
+    """Build a chat completion with a single choice"""
+    message = SimpleNamespace(tool_calls=tool_calls, content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _compacting(limit: int):
+    """Patch the agent config to compact older tool results to limit characters"""
+    return patch.object(base_agent, "config", dataclasses.replace(
+        config, openai=dataclasses.replace(config.openai, history_tool_chars=limit)
+    ))
+
+
+def _tool_messages(create: MagicMock) -> list:
+    """Tool messages of the last request sent to the model"""
+    messages = create.call_args.kwargs["messages"]
+    return [m for m in messages if isinstance(m, dict) and m["role"] == "tool"]
+
+
+class _SearchAgent(BaseAgent):
+    """Agent with one read-only search tool returning many documents"""
+    
+    read_only_tools = frozenset(("search",))
+    
+    def __init__(self):
+        with patch.object(base_agent, "_shared_clients", return_value=(MagicMock(), None, None)):
+            super().__init__(name="TestAgent", role="Test")
+        self.tool_runs = 0
+    
+    def get_system_prompt(self):
+        return "system"
+    
+    def get_tools_schema(self):
+        return []
+    
+    def execute_tool(self, tool_name, arguments):
+        self.tool_runs += 1
+        return {"hits": [{"_id": str(i), "title": f"Document {i}"} for i in range(30)]}
+
+
+class TestRepeatedToolCalls(unittest.TestCase):
+    
+    def test_repeat_after_compaction_returns_full_results(self):
+        agent = _SearchAgent()
+        create = agent.client.chat.completions.create
+        create.side_effect = [
+            _completion([_tool_call("1", "search", {"q": "x"})]),
+            _completion([_tool_call("2", "search", {"q": "y"})]),
+            _completion([_tool_call("3", "search", {"q": "z"})]),
+            _completion([_tool_call("4", "search", {"q": "x"})]),
+            _completion(content="answer")
+        ]
+        
+        with _compacting(200):
+            self.assertEqual(agent.execute("find x", max_iterations=5), "answer")
+        
+        tool_messages = _tool_messages(create)
+        
+        # The first result was compacted, the repeat hands it back whole
+        self.assertTrue(orjson.loads(tool_messages[0]["content"])["truncated"])
+        self.assertEqual(len(orjson.loads(tool_messages[3]["content"])["hits"]), 30)
+        self.assertEqual(agent.tool_runs, 3)
+        self.assertEqual(create.call_args.kwargs["tool_choice"], "none")
+
+
+class TestToolHistoryCompaction(unittest.TestCase):
+    
+    def test_recent_results_stay_whole(self):
+        agent = _SearchAgent()
+        create = agent.client.chat.completions.create
+        create.side_effect = [
+            _completion([_tool_call("1", "search", {"q": "x"})]),
+            _completion([_tool_call("2", "search", {"q": "y"})]),
+            _completion(content="answer")
+        ]
+        
+        with _compacting(200):
+            agent.execute("find x")
+        
+        for message in _tool_messages(create):
+            self.assertEqual(len(orjson.loads(message["content"])["hits"]), 30)
+    
+    def test_truncation_keeps_valid_json(self):
+        content = orjson.dumps({
+            "total": 30,
+            "hits": [{"_id": str(i), "title": "Document " * 10} for i in range(30)]
+        }).decode()
+        
+        truncated = _truncate_result(content, 500)
+        data = orjson.loads(truncated)
+        
+        self.assertLessEqual(len(truncated), 500)
+        self.assertTrue(data["truncated"])
+        self.assertEqual(data["total"], 30)
+        self.assertLess(len(data["hits"]), 30)
+    
+    def test_truncation_of_plain_text(self):
+        self.assertEqual(_truncate_result("x" * 100, 10), "x" * 10 + base_agent._TRUNCATED_MARKER)
+
+
+if __name__ == "__main__":
+    unittest.main()
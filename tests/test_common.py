@@ -0,0 +1,138 @@
+"""
+Tests for the caches and request helpers shared by the Elasticsearch tools
+"""
+import dataclasses
+import unittest
+from unittest.mock import patch
+from config.config import config
+from tools import common
+
+
+def _cache_entry(index: str) -> tuple:
+    """Cache a search response for an index and return its key"""
+    key = common.search_cache_key(index, common.search_body({"match_all": {}}))
+    common.cache_search(key, {"hits": {"hits": []}})
+    return key
+
+
+class _CacheTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        common._RESULT_CACHE.clear()
+        common._RECENT_WRITES.clear()
+        common._INDICES_CACHE.clear()
+
+
+class TestInvalidate(_CacheTestCase):
+    
+    def test_overlaps(self):
+        self.assertTrue(common._overlaps("logs", "logs"))
+        self.assertTrue(common._overlaps("orders,logs", "logs"))
+        self.assertTrue(common._overlaps("logs-*", "logs-2024"))
+        self.assertTrue(common._overlaps("logs-2024", "logs-*"))
+        self.assertTrue(common._overlaps("_all", "orders"))
+        self.assertFalse(common._overlaps("orders,users", "logs"))
+        self.assertFalse(common._overlaps("logs-*", "metrics-2024"))
+    
+    def test_drops_only_overlapping_entries(self):
+        keys = {index: _cache_entry(index) for index in ("logs-*", "orders,logs-2024", "_all", "users")}
+        
+        common.invalidate("logs-2024")
+        
+        for index in ("logs-*", "orders,logs-2024", "_all"):
+            self.assertIsNone(common.cached_search(keys[index]), index)
+        self.assertIsNotNone(common.cached_search(keys["users"]))
+    
+    def test_written_index_is_not_cached_again(self):
+        common.invalidate("logs-2024")
+        
+        self.assertIsNone(common.cached_search(_cache_entry("logs-*")))
+        self.assertIsNotNone(common.cached_search(_cache_entry("users")))
+    
+    def test_large_searches_are_not_cached(self):
+        body = common.search_body({"match_all": {}}, size=common._MAX_CACHED_HITS + 1)
+        
+        self.assertIsNone(common.search_cache_key("logs", body))
+
+
+class TestIndexList(_CacheTestCase):
+    
+    def test_parses_and_caches_names(self):
+        self.assertEqual(common.cache_indices(b"orders\n.security\n logs \n\n"), ["orders", "logs"])
+        self.assertEqual(common.cached_indices(), ["orders", "logs"])
+    
+    def test_write_to_unlisted_index_drops_the_list(self):
+        common.cache_indices("orders\n")
+        
+        common.forget_unlisted("orders")
+        self.assertEqual(common.cached_indices(), ["orders"])
+        
+        common.forget_unlisted("new-index")
+        self.assertIsNone(common.cached_indices())
+
+
+class TestBulkChunking(unittest.TestCase):
+    
+    def setUp(self):
+        patcher = patch.object(common, "config", dataclasses.replace(
+            config, elasticsearch=dataclasses.replace(
+                config.elasticsearch, bulk_chunk_size=0, bulk_max_chunk_bytes=1024 * 1024
+            )
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_explicit_chunk_size_is_kept(self):
+        documents = [{"n": 1}]
+        
+        self.assertEqual(common.bulk_chunking(documents, 7, 2048), (7, 2048, documents))
+    
+    def test_small_documents_hit_the_upper_bound(self):
+        chunk_size, _, _ = common.bulk_chunking([{"n": i} for i in range(10)], max_chunk_bytes=100 * 1024 * 1024)
+        
+        self.assertEqual(chunk_size, common._MAX_CHUNK_SIZE)
+    
+    def test_large_documents_hit_the_lower_bound(self):
+        chunk_size, _, _ = common.bulk_chunking([{"text": "x" * 100_000}] * 10)
+        
+        self.assertEqual(chunk_size, common._MIN_CHUNK_SIZE)
+    
+    def test_chunk_size_follows_document_size(self):
+        chunk_size, max_chunk_bytes, _ = common.bulk_chunking([{"text": "x" * 4000}] * 10)
+        
+        self.assertEqual(max_chunk_bytes, 1024 * 1024)
+        self.assertEqual(chunk_size, 1024 * 1024 // 4011)
+    
+    def test_sampled_documents_are_not_lost(self):
+        documents = ({"n": i} for i in range(100))
+        
+        _, _, documents = common.bulk_chunking(documents)
+        
+        self.assertEqual([doc["n"] for doc in documents], list(range(100)))
+
+
+class TestMsearch(unittest.TestCase):
+    
+    def test_body_interleaves_headers(self):
+        body = common.msearch_body([("a", {"size": 0}), ("b", {"size": 1})])
+        
+        self.assertEqual(body, [{"index": "a"}, {"size": 0}, {"index": "b"}, {"size": 1}])
+    
+    def test_results_split_errors_per_search(self):
+        response = {
+            "responses": [
+                {"hits": {"hits": []}},
+                {"error": {"type": "index_not_found_exception", "reason": "no such index [b]"}},
+                {"error": "plain failure"}
+            ]
+        }
+        
+        self.assertEqual(common.msearch_results(response), [
+            {"hits": {"hits": []}},
+            {"error": "no such index [b]"},
+            {"error": "plain failure"}
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+"""
+Tests for the default settings IndexAgent adds to new indices
+"""
+import unittest
+from agents.index_agent import _apply_default_settings
+
+
+class TestDefaultIndexSort(unittest.TestCase):
+    
+    def test_sorts_by_timestamp(self):
+        mappings = {"properties": {"@timestamp": {"type": "date"}, "message": {"type": "text"}}}
+        
+        settings = _apply_default_settings(None, mappings)
+        
+        self.assertEqual(settings["index"]["sort.field"], ["@timestamp"])
+        self.assertEqual(settings["index"]["sort.order"], ["desc"])
+    
+    def test_no_sort_with_nested_field(self):
+        mappings = {
+            "properties": {
+                "@timestamp": {"type": "date"},
+                "comments": {"type": "nested", "properties": {"text": {"type": "text"}}}
+            }
+        }
+        
+        self.assertNotIn("sort.field", _apply_default_settings(None, mappings).get("index", {}))
+    
+    def test_no_sort_with_deeply_nested_field(self):
+        mappings = {
+            "properties": {
+                "@timestamp": {"type": "date"},
+                "order": {"properties": {"lines": {"type": "nested"}}}
+            }
+        }
+        
+        self.assertNotIn("sort.field", _apply_default_settings(None, mappings).get("index", {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
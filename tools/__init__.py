@@ -1,4 +1,5 @@
 from .elasticsearch_tools import ElasticsearchTools
+from .async_elasticsearch_tools import AsyncElasticsearchTools
 from .query_builder import QueryBuilder
 
-__all__ = ['ElasticsearchTools', 'QueryBuilder']
+__all__ = ['ElasticsearchTools', 'AsyncElasticsearchTools', 'QueryBuilder']
@@ -0,0 +1,387 @@
+"""
+Asyncio Elasticsearch tools for agent operations
+"""
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from elasticsearch.exceptions import NotFoundError, RequestError
+from elasticsearch.helpers import async_streaming_bulk
+from config.config import get_async_es_client
+from tools import common
+from tools.query_builder import QueryBuilder
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__, "elasticsearch_tools.log")
+
+
+class AsyncElasticsearchTools:
+    """
+    Coroutine counterparts of ElasticsearchTools for asyncio callers
+    
+    Concurrent calls share one event loop instead of each blocking a thread on
+    the network round trip. Requests are built, and responses shaped and
+    cached, by the same tools.common helpers as the synchronous tools.
+    """
+    
+    def __init__(self):
+        """Initialize AsyncElasticsearch client"""
+        # The pooled client is shared by every async tools instance in the process
+        self.client = get_async_es_client()
+    
+    invalidate = staticmethod(common.invalidate)
+    
+    async def close(self) -> None:
+        """Close the connections of the shared client"""
+        await self.client.close()
+        get_async_es_client.cache_clear()
+    
+    async def search(self, index: str, query: Dict[str, Any], size: int = 10,
+                     source_includes: Optional[List[str]] = None,
+                     filter_path: Optional[str] = None,
+                     filter_only: bool = False,
+                     use_request_cache: bool = False) -> Dict[str, Any]:
+        """
+        Search documents in an index
+        
+        Args:
+            index: Index name
+            query: Query DSL
+            size: Number of results
+            source_includes: Only return these source fields
+            filter_path: Only return these parts of the response
+            filter_only: Run the query in filter context, skipping scoring
+            use_request_cache: Cache the response in the shard request cache
+            
+        Returns:
+            Search results
+        """
+        try:
+            body = common.search_body(query, size, source_includes, filter_only)
+            
+            key = common.search_cache_key(index, body, filter_path)
+            cached = common.cached_search(key)
+            if cached is not None:
+                logger.info("Reusing cached search results for index '%s'", index)
+                return cached
+            
+            logger.info("Searching index '%s' with query: %s", index, body["query"])
+            response = await self.client.search(
+                index=index, body=body, filter_path=filter_path,
+                request_cache=use_request_cache or None
+            )
+            # filter_path or track_total_hits may leave the total out of the response
+            hits = response.get("hits", {})
+            if "total" in hits:
+                logger.info("Found %s documents", hits["total"]["value"])
+            else:
+                logger.info("Returned %d documents", len(hits.get("hits", [])))
+            common.cache_search(key, response)
+            return response
+        except NotFoundError:
+            logger.error("Index '%s' not found", index)
+            return {"error": f"Index '{index}' not found"}
+        except Exception as e:
+            logger.error("Search error: %s", e)
+            return {"error": str(e)}
+    
+    async def index_document(self, index: str, document: Dict[str, Any],
+                             doc_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Index a document
+        
+        Args:
+            index: Index name
+            document: Document to index
+            doc_id: Optional document ID
+            
+        Returns:
+            Index response
+        """
+        try:
+            logger.info("Indexing document to '%s'", index)
+            response = await self.client.index(index=index, body=document, id=doc_id)
+            logger.info("Document indexed with ID: %s", response["_id"])
+            return response
+        except Exception as e:
+            logger.error("Index error: %s", e)
+            return {"error": str(e)}
+        finally:
+            # Writing to a missing index creates it
+            common.forget_unlisted(index)
+            self.invalidate(index)
+    
+    async def bulk_index(self, index: str, documents: Iterable[Dict[str, Any]],
+                         chunk_size: Optional[int] = None,
+                         max_chunk_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Bulk index documents, streaming chunks to Elasticsearch one after another
+        
+        Args:
+            index: Index name
+            documents: Documents to index; any iterable, consumed lazily
+            chunk_size: Documents per _bulk request (defaults to config, or to a
+                size derived from the first documents when that is 0)
+            max_chunk_bytes: Maximum size of a _bulk request body (defaults to config)
+            
+        Returns:
+            Bulk response
+        """
+        try:
+            chunk_size, max_chunk_bytes, documents = common.bulk_chunking(
+                documents, chunk_size, max_chunk_bytes
+            )
+            
+            logger.info(
+                "Bulk indexing documents to '%s' in chunks of %d documents",
+                index, chunk_size
+            )
+            result = common.BulkResult()
+            
+            async for ok, item in async_streaming_bulk(
+                self.client, common.bulk_actions(index, documents), chunk_size=chunk_size,
+                max_chunk_bytes=max_chunk_bytes, raise_on_error=False
+            ):
+                result.add(ok, item)
+            
+            logger.info(
+                "Successfully indexed %d documents, %d failed", result.success, result.failed
+            )
+            
+            return result.to_dict()
+        except Exception as e:
+            logger.error("Bulk index error: %s", e)
+            return {"error": str(e)}
+        finally:
+            # Writing to a missing index creates it
+            common.forget_unlisted(index)
+            self.invalidate(index)
+    
+    async def create_index(self, index: str, mappings: Optional[Dict[str, Any]] = None,
+                           settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Create an index
+        
+        Args:
+            index: Index name
+            mappings: Index mappings
+            settings: Index settings
+            
+        Returns:
+            Create response
+        """
+        try:
+            logger.info("Creating index '%s'", index)
+            response = await self.client.indices.create(
+                index=index, body=common.create_index_body(mappings, settings)
+            )
+            logger.info("Index '%s' created successfully", index)
+            return response
+        except RequestError as e:
+            if "resource_already_exists_exception" in str(e):
+                logger.warning("Index '%s' already exists", index)
+                return {"error": "Index already exists"}
+            logger.error("Create index error: %s", e)
+            return {"error": str(e)}
+        except Exception as e:
+            logger.error("Create index error: %s", e)
+            return {"error": str(e)}
+        finally:
+            common.forget_indices()
+            self.invalidate(index)
+    
+    async def delete_index(self, index: str) -> Dict[str, Any]:
+        """
+        Delete an index
+        
+        Args:
+            index: Index name
+            
+        Returns:
+            Delete response
+        """
+        try:
+            logger.info("Deleting index '%s'", index)
+            response = await self.client.indices.delete(index=index)
+            logger.info("Index '%s' deleted successfully", index)
+            return response
+        except NotFoundError:
+            logger.error("Index '%s' not found", index)
+            return {"error": f"Index '{index}' not found"}
+        except Exception as e:
+            logger.error("Delete index error: %s", e)
+            return {"error": str(e)}
+        finally:
+            common.forget_indices()
+            self.invalidate(index)
+    
+    async def get_index_info(self, index: str) -> Dict[str, Any]:
+        """
+        Get index information
+        
+        Args:
+            index: Index name
+            
+        Returns:
+            Index information
+        """
+        try:
+            logger.info("Getting info for index '%s'", index)
+            info, stats = await asyncio.gather(
+                self.client.indices.get(index=index, features=["mappings", "settings"]),
+                self.client.indices.stats(index=index)
+            )
+            
+            return common.index_info(info, stats)
+        except NotFoundError:
+            logger.error("Index '%s' not found", index)
+            return {"error": f"Index '{index}' not found"}
+        except Exception as e:
+            logger.error("Get index info error: %s", e)
+            return {"error": str(e)}
+    
+    async def list_indices(self) -> List[str]:
+        """
+        List all indices
+        
+        Returns:
+            List of index names
+        """
+        cached = common.cached_indices()
+        if cached is not None:
+            return cached
+        
+        try:
+            logger.info("Listing all indices")
+            index_names = common.cache_indices(
+                (await self.client.cat.indices(h="index", format="text")).body
+            )
+            logger.info("Found %d indices", len(index_names))
+            return index_names
+        except Exception as e:
+            logger.error("List indices error: %s", e)
+            return []
+    
+    async def aggregate(self, index: str, aggregations: Dict[str, Any],
+                        query: Optional[Dict[str, Any]] = None,
+                        terminate_after: Optional[int] = None,
+                        track_total_hits: bool = False,
+                        use_request_cache: bool = False) -> Dict[str, Any]:
+        """
+        Perform aggregations
+        
+        Args:
+            index: Index name
+            aggregations: Aggregation DSL
+            query: Optional query filter
+            terminate_after: Optional per-shard document collection limit
+            track_total_hits: Count all matching documents exactly
+            use_request_cache: Cache the response in the shard request cache
+                even where the index setting disables it
+                
+        Returns:
+            Aggregation results
+        """
+        try:
+            body = QueryBuilder.aggregation_body(
+                aggregations, query, terminate_after, track_total_hits
+            )
+            
+            logger.info("Running aggregations on index '%s'", index)
+            response = await self.client.search(
+                index=index, body=body, request_cache=use_request_cache or None
+            )
+            logger.info("Aggregations completed successfully")
+            return response
+        except Exception as e:
+            logger.error("Aggregation error: %s", e)
+            return {"error": str(e)}
+    
+    async def count(self, index: str, query: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        Count documents matching a query
+        
+        Args:
+            index: Index name
+            query: Optional query filter
+            
+        Returns:
+            Number of matching documents, or None on error
+        """
+        try:
+            response = await self.client.count(index=index, body=common.count_body(query))
+            logger.info("Index '%s' has %s matching documents", index, response["count"])
+            return response["count"]
+        except Exception as e:
+            logger.error("Count error: %s", e)
+            return None
+    
+    async def msearch(self, searches: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Run several searches in a single _msearch request
+        
+        Args:
+            searches: List of (index, search body) pairs
+            
+        Returns:
+            One search response (or error) per search, in request order
+        """
+        try:
+            logger.info("Running %d searches in one msearch request", len(searches))
+            response = await self.client.msearch(body=common.msearch_body(searches))
+            logger.info("Msearch completed successfully")
+            
+            return common.msearch_results(response)
+        except Exception as e:
+            logger.error("Msearch error: %s", e)
+            return [{"error": str(e)} for _ in searches]
+    
+    async def update_document(self, index: str, doc_id: str,
+                              update: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Update a document
+        
+        Args:
+            index: Index name
+            doc_id: Document ID
+            update: Update script or doc
+            
+        Returns:
+            Update response
+        """
+        try:
+            logger.info("Updating document %s in index '%s'", doc_id, index)
+            response = await self.client.update(index=index, id=doc_id, body={"doc": update})
+            logger.info("Document %s updated successfully", doc_id)
+            return response
+        except NotFoundError:
+            logger.error("Document %s not found in index '%s'", doc_id, index)
+            return {"error": "Document not found"}
+        except Exception as e:
+            logger.error("Update error: %s", e)
+            return {"error": str(e)}
+        finally:
+            self.invalidate(index)
+    
+    async def delete_document(self, index: str, doc_id: str) -> Dict[str, Any]:
+        """
+        Delete a document
+        
+        Args:
+            index: Index name
+            doc_id: Document ID
+            
+        Returns:
+            Delete response
+        """
+        try:
+            logger.info("Deleting document %s from index '%s'", doc_id, index)
+            response = await self.client.delete(index=index, id=doc_id)
+            logger.info("Document %s deleted successfully", doc_id)
+            return response
+        except NotFoundError:
+            logger.error("Document %s not found in index '%s'", doc_id, index)
+            return {"error": "Document not found"}
+        except Exception as e:
+            logger.error("Delete error: %s", e)
+            return {"error": str(e)}
+        finally:
+            self.invalidate(index)
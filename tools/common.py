@@ -0,0 +1,252 @@
+"""
+Request building, response shaping and caches shared by the sync and async Elasticsearch tools
+"""
+from fnmatch import fnmatchcase
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import orjson
+from config.config import config
+from utils.cache import LRUCache
+from utils.helpers import query_fingerprint
+
+# Failed items kept in a bulk result; enough to diagnose the failures
+_MAX_BULK_ERRORS = 10
+
+# Documents sampled to estimate the average size, and the bounds of the derived chunk size
+_CHUNK_SAMPLE_DOCS = 32
+_MIN_CHUNK_SIZE = 50
+_MAX_CHUNK_SIZE = 5000
+
+# Searches returning more hits than this are not cached, to keep entries small
+_MAX_CACHED_HITS = 50
+
+# Search responses are shared by every tools instance so that writes invalidate them everywhere
+_RESULT_CACHE = LRUCache(maxsize=config.result_cache_size, ttl=config.result_cache_ttl)
+
+# Indices written within the last cache lifetime; their new documents may not be
+# searchable until the next refresh, so responses read from them are not cached
+_RECENT_WRITES = LRUCache(maxsize=config.result_cache_size, ttl=config.result_cache_ttl)
+
+# Agents ask for the index list on most turns; it rarely changes meanwhile
+_INDICES_CACHE = LRUCache(maxsize=1, ttl=config.list_indices_ttl)
+
+
+def _overlaps(index: str, target: str) -> bool:
+    """Check whether a comma-separated index expression may read from a written index"""
+    return any(
+        pattern == "_all" or fnmatchcase(target, pattern) or fnmatchcase(pattern, target)
+        for pattern in index.split(",")
+    )
+
+
+def _recently_written(index: str) -> bool:
+    """Check whether an index expression covers an index written since the cache lifetime began"""
+    return any(_overlaps(index, written) for written in _RECENT_WRITES.keys())
+
+
+def invalidate(index: str) -> None:
+    """
+    Drop cached search results that may read from an index
+    
+    The index also stops being cached for the cache lifetime, since searches
+    before the next refresh would still miss the written documents.
+    
+    Args:
+        index: Index name or pattern that was written to
+    """
+    _RECENT_WRITES.set(index, True)
+    for key in _RESULT_CACHE.keys():
+        if _overlaps(key[0], index):
+            _RESULT_CACHE.pop(key)
+
+
+def search_body(query: Dict[str, Any], size: int = 10,
+                source_includes: Optional[List[str]] = None,
+                filter_only: bool = False) -> Dict[str, Any]:
+    """Build a search request body, in filter context when filter_only is set"""
+    if filter_only:
+        query = {"constant_score": {"filter": query}}
+    
+    body = {"query": query, "size": size}
+    if source_includes:
+        body["_source"] = source_includes
+    return body
+
+
+def search_cache_key(index: str, body: Dict[str, Any],
+                     filter_path: Optional[str] = None) -> Optional[Tuple[str, bytes]]:
+    """
+    Build a result cache key from the index and a digest of the canonical request
+    
+    Returns:
+        Cache key, or None when the search is not cacheable
+    """
+    if config.result_cache_ttl <= 0 or body.get("size", 10) > _MAX_CACHED_HITS:
+        return None
+    
+    try:
+        return index, query_fingerprint((body, filter_path))
+    except TypeError:
+        return None
+
+
+def cached_search(key: Optional[Tuple[str, bytes]]) -> Optional[Dict[str, Any]]:
+    """Get a cached search response, or None on a miss"""
+    return _RESULT_CACHE.get(key) if key else None
+
+
+def cache_search(key: Optional[Tuple[str, bytes]], response: Dict[str, Any]) -> None:
+    """Cache a search response unless its indices were written too recently"""
+    if key and not _recently_written(key[0]):
+        _RESULT_CACHE.set(key, response)
+
+
+def cached_indices() -> Optional[List[str]]:
+    """Get a copy of the cached index names, or None on a miss"""
+    cached = _INDICES_CACHE.get("indices")
+    return list(cached) if cached is not None else None
+
+
+def cache_indices(raw: Union[str, bytes]) -> List[str]:
+    """
+    Parse and cache the plain-text _cat/indices name column, skipping hidden indices
+    
+    Returns:
+        A copy of the index names
+    """
+    if isinstance(raw, bytes):
+        raw = raw.decode()
+    index_names = [
+        name for name in map(str.strip, raw.splitlines())
+        if name and not name.startswith(".")
+    ]
+    _INDICES_CACHE.set("indices", index_names)
+    return list(index_names)
+
+
+def forget_indices() -> None:
+    """Drop the cached index names after an index is created or deleted"""
+    _INDICES_CACHE.clear()
+
+
+def forget_unlisted(index: str) -> None:
+    """Drop the cached index names if a document write may have auto-created the index"""
+    cached = cached_indices()
+    if cached is not None and index not in cached:
+        forget_indices()
+
+
+def bulk_actions(index: str, documents: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Yield one bulk index action per document"""
+    for doc in documents:
+        yield {"_index": index, "_source": doc}
+
+
+def bulk_chunking(documents: Iterable[Dict[str, Any]],
+                  chunk_size: Optional[int] = None,
+                  max_chunk_bytes: Optional[int] = None) -> Tuple[int, int, Iterable[Dict[str, Any]]]:
+    """
+    Resolve the bulk chunk size and byte limit, falling back to config
+    
+    With no chunk size configured either, one is picked that fills
+    max_chunk_bytes given the average size of the first documents.
+    
+    Args:
+        documents: Documents to index
+        chunk_size: Requested documents per _bulk request
+        max_chunk_bytes: Requested maximum size of a _bulk request body
+    
+    Returns:
+        Chunk size, byte limit, and the documents including any sample taken
+    """
+    max_chunk_bytes = max_chunk_bytes or config.elasticsearch.bulk_max_chunk_bytes
+    chunk_size = chunk_size or config.elasticsearch.bulk_chunk_size
+    if chunk_size:
+        return chunk_size, max_chunk_bytes, documents
+    
+    documents = iter(documents)
+    sample = list(islice(documents, _CHUNK_SAMPLE_DOCS))
+    
+    # Small documents are treated as 1 KiB so chunks never get excessively long
+    avg_size = sum(len(orjson.dumps(doc)) for doc in sample) / max(len(sample), 1)
+    chunk_size = int(max_chunk_bytes / max(avg_size, 1024))
+    
+    chunk_size = max(_MIN_CHUNK_SIZE, min(_MAX_CHUNK_SIZE, chunk_size))
+    return chunk_size, max_chunk_bytes, chain(sample, documents)
+
+
+class BulkResult:
+    """Tally of the per-document outcomes of a bulk load"""
+    
+    def __init__(self):
+        self.processed = 0
+        self.success = 0
+        self.errors = []
+    
+    def add(self, ok: bool, item: Dict[str, Any]) -> None:
+        """Record one document outcome, keeping the first few failures"""
+        self.processed += 1
+        if ok:
+            self.success += 1
+        elif len(self.errors) < _MAX_BULK_ERRORS:
+            self.errors.append(item)
+    
+    @property
+    def failed(self) -> int:
+        return self.processed - self.success
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Build the bulk response returned to callers"""
+        return {
+            "success": self.success,
+            "failed": self.failed,
+            "total": self.processed,
+            "errors": self.errors
+        }
+
+
+def create_index_body(mappings: Optional[Dict[str, Any]] = None,
+                      settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build a create index request body from optional mappings and settings"""
+    body = {}
+    if mappings:
+        body["mappings"] = mappings
+    if settings:
+        body["settings"] = settings
+    return body
+
+
+def index_info(info: Dict[str, Any], stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Split a combined get index response into the _mapping and _settings shapes"""
+    return {
+        "mappings": {name: {"mappings": data.get("mappings", {})} for name, data in info.items()},
+        "settings": {name: {"settings": data.get("settings", {})} for name, data in info.items()},
+        "stats": stats
+    }
+
+
+def count_body(query: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Build a count request body, None counting every document"""
+    return {"query": query} if query else None
+
+
+def msearch_body(searches: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Interleave header and body lines for an _msearch request"""
+    body = []
+    for index, search_body in searches:
+        body.append({"index": index})
+        body.append(search_body)
+    return body
+
+
+def msearch_results(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Split an _msearch response into one response or error per search"""
+    results = []
+    for item in response["responses"]:
+        if "error" in item:
+            error = item["error"]
+            reason = error.get("reason", error) if isinstance(error, dict) else error
+            results.append({"error": str(reason)})
+        else:
+            results.append(item)
+    return results
@@ -1,35 +1,59 @@
 """
 Elasticsearch tools for agent operations
 """
-from typing import Any, Dict, List, Optional
-from elasticsearch import Elasticsearch
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from elasticsearch.exceptions import NotFoundError, RequestError
-from config.config import config
+from elasticsearch.helpers import parallel_bulk
+from config.config import config, get_es_client
+from tools import common
+from tools.query_builder import QueryBuilder
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__, "elasticsearch_tools.log")
 
 
+@lru_cache(maxsize=1)
+def _connected_client() -> Any:
+    """Get the shared client, checking the connection the first time only"""
+    client = get_es_client()
+    
+    # A failed check raises and is not cached, so the next caller retries
+    try:
+        info = client.info()
+        logger.info("Connected to Elasticsearch %s", info["version"]["number"])
+    except Exception as e:
+        logger.error("Failed to connect to Elasticsearch: %s", e)
+        raise
+    
+    return client
+
+
 class ElasticsearchTools:
-    """Tools for interacting with Elasticsearch"""
+    """
+    Tools for interacting with Elasticsearch
+    
+    Instances are cheap to construct: they all share one pooled client, and
+    the connection is only checked when the first instance is created.
+    """
     
     def __init__(self):
         """Initialize Elasticsearch client"""
-        self.client = Elasticsearch(
-            [config.elasticsearch.url],
-            verify_certs=config.elasticsearch.verify_certs,
-            request_timeout=config.timeout
-        )
-        
-        # Test connection
-        try:
-            info = self.client.info()
-            logger.info(f"Connected to Elasticsearch {info['version']['number']}")
-        except Exception as e:
-            logger.error(f"Failed to connect to Elasticsearch: {e}")
-            raise
+        # The pooled client is shared by every tools instance in the process
+        self.client = _connected_client()
+    
+    # Search results and the index list are cached process-wide, in tools.common
+    invalidate = staticmethod(common.invalidate)
     
-    def search(self, index: str, query: Dict[str, Any], size: int = 10) -> Dict[str, Any]:
+    def search(self, index: str, query: Dict[str, Any], size: int = 10,
+               source_includes: Optional[List[str]] = None,
+               filter_path: Optional[str] = None,
+               filter_only: bool = False,
+               use_request_cache: bool = False) -> Dict[str, Any]:
         """
         Search documents in an index
         
@@ -37,23 +61,42 @@ class ElasticsearchTools:
             index: Index name
             query: Query DSL
             size: Number of results
+            source_includes: Only return these source fields
+            filter_path: Only return these parts of the response
+            filter_only: Run the query in filter context, skipping scoring so
+                Elasticsearch can serve it from its filter cache
+            use_request_cache: Cache the response in the shard request cache
             
         Returns:
             Search results
         """
         try:
-            logger.info(f"Searching index '{index}' with query: {query}")
+            body = common.search_body(query, size, source_includes, filter_only)
+            
+            key = common.search_cache_key(index, body, filter_path)
+            cached = common.cached_search(key)
+            if cached is not None:
+                logger.info("Reusing cached search results for index '%s'", index)
+                return cached
+            
+            logger.info("Searching index '%s' with query: %s", index, body["query"])
             response = self.client.search(
-                index=index,
-                body={"query": query, "size": size}
+                index=index, body=body, filter_path=filter_path,
+                request_cache=use_request_cache or None
             )
-            logger.info(f"Found {response['hits']['total']['value']} documents")
+            # filter_path or track_total_hits may leave the total out of the response
+            hits = response.get("hits", {})
+            if "total" in hits:
+                logger.info("Found %s documents", hits["total"]["value"])
+            else:
+                logger.info("Returned %d documents", len(hits.get("hits", [])))
+            common.cache_search(key, response)
             return response
         except NotFoundError:
-            logger.error(f"Index '{index}' not found")
+            logger.error("Index '%s' not found", index)
             return {"error": f"Index '{index}' not found"}
         except Exception as e:
-            logger.error(f"Search error: {e}")
+            logger.error("Search error: %s", e)
             return {"error": str(e)}
     
     def index_document(self, index: str, document: Dict[str, Any], doc_id: Optional[str] = None) -> Dict[str, Any]:
@@ -69,52 +112,162 @@ class ElasticsearchTools:
             Index response
         """
         try:
-            logger.info(f"Indexing document to '{index}'")
+            logger.info("Indexing document to '%s'", index)
             response = self.client.index(
                 index=index,
                 body=document,
                 id=doc_id
             )
-            logger.info(f"Document indexed with ID: {response['_id']}")
+            logger.info("Document indexed with ID: %s", response["_id"])
             return response
         except Exception as e:
-            logger.error(f"Index error: {e}")
+            logger.error("Index error: %s", e)
             return {"error": str(e)}
+        finally:
+            # Writing to a missing index creates it
+            common.forget_unlisted(index)
+            self.invalidate(index)
     
-    def bulk_index(self, index: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def bulk_index(self, index: str, documents: Iterable[Dict[str, Any]],
+                   chunk_size: Optional[int] = None,
+                   max_chunk_bytes: Optional[int] = None,
+                   thread_count: Optional[int] = None,
+                   queue_size: Optional[int] = None) -> Dict[str, Any]:
         """
-        Bulk index documents
+        Bulk index documents, sending chunks to Elasticsearch from several threads
         
         Args:
             index: Index name
-            documents: List of documents
+            documents: Documents to index; any iterable, consumed lazily
+            chunk_size: Documents per _bulk request (defaults to config, or to a
+                size derived from the first documents when that is 0)
+            max_chunk_bytes: Maximum size of a _bulk request body (defaults to config)
+            thread_count: Concurrent _bulk requests (defaults to, and capped at, config)
+            queue_size: Chunks prepared ahead of the threads (defaults to, and capped at, config)
             
         Returns:
-            Bulk response
+            Bulk response, with the values used under "capped" when a requested
+            thread count or queue size was out of bounds
         """
         try:
-            from elasticsearch.helpers import bulk
+            chunk_size, max_chunk_bytes, documents = common.bulk_chunking(
+                documents, chunk_size, max_chunk_bytes
+            )
             
-            actions = [
-                {
-                    "_index": index,
-                    "_source": doc
-                }
-                for doc in documents
-            ]
+            # The configured values bound what callers may ask for: every thread
+            # holds a pooled connection and every queued chunk is held in memory
+            requested = {"thread_count": thread_count, "queue_size": queue_size}
+            thread_count = max(1, min(
+                thread_count or config.elasticsearch.bulk_thread_count,
+                config.elasticsearch.bulk_thread_count
+            ))
+            queue_size = max(1, min(
+                queue_size or config.elasticsearch.bulk_queue_size,
+                config.elasticsearch.bulk_queue_size
+            ))
+            capped = {
+                name: used
+                for name, used in (("thread_count", thread_count), ("queue_size", queue_size))
+                if requested[name] and requested[name] != used
+            }
+            if capped:
+                logger.warning(
+                    "Bulk load to '%s' requested %s, using %s",
+                    index, {name: requested[name] for name in capped}, capped
+                )
+            
+            logger.info(
+                "Bulk indexing documents to '%s' in chunks of %d documents",
+                index, chunk_size
+            )
+            result = common.BulkResult()
+            started = chunk_started = time.perf_counter()
             
-            logger.info(f"Bulk indexing {len(documents)} documents to '{index}'")
-            success, failed = bulk(self.client, actions, raise_on_error=False)
-            logger.info(f"Successfully indexed {success} documents, {failed} failed")
+            # The client is thread-safe and shares its connection pool between
+            # the worker threads, so it must not be recreated per thread
+            for ok, item in parallel_bulk(
+                self.client, common.bulk_actions(index, documents), thread_count=thread_count,
+                chunk_size=chunk_size, max_chunk_bytes=max_chunk_bytes,
+                queue_size=queue_size, raise_on_error=False
+            ):
+                result.add(ok, item)
+                
+                if result.processed % chunk_size == 0 and logger.isEnabledFor(logging.INFO):
+                    now = time.perf_counter()
+                    logger.info(
+                        "Indexed %d documents (%.0f docs/s)",
+                        result.processed, chunk_size / max(now - chunk_started, 1e-6)
+                    )
+                    chunk_started = now
             
-            return {
-                "success": success,
-                "failed": failed,
-                "total": len(documents)
-            }
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "Successfully indexed %d documents, %d failed in %.2fs",
+                result.success, result.failed, elapsed
+            )
+            
+            response = result.to_dict()
+            if capped:
+                response["capped"] = capped
+            return response
         except Exception as e:
-            logger.error(f"Bulk index error: {e}")
+            logger.error("Bulk index error: %s", e)
             return {"error": str(e)}
+        finally:
+            # Writing to a missing index creates it
+            common.forget_unlisted(index)
+            self.invalidate(index)
+    
+    @contextmanager
+    def bulk_ingest_mode(self, index: str) -> Iterator[None]:
+        """
+        Disable refreshes and replicas on an index for the duration of a bulk load
+        
+        The previous settings are restored on exit, followed by a single refresh
+        so the loaded documents become searchable. Use it around large loads:
+        
+            with tools.bulk_ingest_mode(index):
+                tools.bulk_index(index, documents)
+        
+        Args:
+            index: Index name, alias or pattern; every index it resolves to gets
+                its own settings back
+        """
+        names = ["index.refresh_interval", "index.number_of_replicas"]
+        previous = None
+        
+        try:
+            # Keyed by concrete index name, whatever the expression was
+            response = self.client.indices.get_settings(
+                index=index, name=names, flat_settings=True
+            )
+            previous = {
+                concrete: {name: data.get("settings", {}).get(name) for name in names}
+                for concrete, data in response.items()
+            }
+            self.client.indices.put_settings(
+                index=index,
+                body={"index.refresh_interval": "-1", "index.number_of_replicas": 0}
+            )
+            logger.info("Bulk ingest mode enabled for index '%s'", index)
+        except Exception as e:
+            # The load still works, just without the tuning
+            logger.error("Could not enable bulk ingest mode for '%s': %s", index, e)
+            previous = None
+        
+        try:
+            yield
+        finally:
+            if previous is not None:
+                try:
+                    # Settings that were unset are reset to their defaults with None
+                    for concrete, settings in previous.items():
+                        self.client.indices.put_settings(index=concrete, body=settings)
+                    self.client.indices.refresh(index=index)
+                    logger.info("Bulk ingest mode disabled for index '%s'", index)
+                except Exception as e:
+                    logger.error("Could not restore settings for '%s': %s", index, e)
+            self.invalidate(index)
     
     def create_index(self, index: str, mappings: Optional[Dict[str, Any]] = None, 
                      settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -130,25 +283,24 @@ class ElasticsearchTools:
             Create response
         """
         try:
-            body = {}
-            if mappings:
-                body["mappings"] = mappings
-            if settings:
-                body["settings"] = settings
-            
-            logger.info(f"Creating index '{index}'")
-            response = self.client.indices.create(index=index, body=body)
-            logger.info(f"Index '{index}' created successfully")
+            logger.info("Creating index '%s'", index)
+            response = self.client.indices.create(
+                index=index, body=common.create_index_body(mappings, settings)
+            )
+            logger.info("Index '%s' created successfully", index)
             return response
         except RequestError as e:
             if "resource_already_exists_exception" in str(e):
-                logger.warning(f"Index '{index}' already exists")
+                logger.warning("Index '%s' already exists", index)
                 return {"error": "Index already exists"}
-            logger.error(f"Create index error: {e}")
+            logger.error("Create index error: %s", e)
             return {"error": str(e)}
         except Exception as e:
-            logger.error(f"Create index error: {e}")
+            logger.error("Create index error: %s", e)
             return {"error": str(e)}
+        finally:
+            common.forget_indices()
+            self.invalidate(index)
     
     def delete_index(self, index: str) -> Dict[str, Any]:
         """
@@ -161,16 +313,19 @@ class ElasticsearchTools:
             Delete response
         """
         try:
-            logger.info(f"Deleting index '{index}'")
+            logger.info("Deleting index '%s'", index)
             response = self.client.indices.delete(index=index)
-            logger.info(f"Index '{index}' deleted successfully")
+            logger.info("Index '%s' deleted successfully", index)
             return response
         except NotFoundError:
-            logger.error(f"Index '{index}' not found")
+            logger.error("Index '%s' not found", index)
             return {"error": f"Index '{index}' not found"}
         except Exception as e:
-            logger.error(f"Delete index error: {e}")
+            logger.error("Delete index error: %s", e)
             return {"error": str(e)}
+        finally:
+            common.forget_indices()
+            self.invalidate(index)
     
     def get_index_info(self, index: str) -> Dict[str, Any]:
         """
@@ -183,21 +338,21 @@ class ElasticsearchTools:
             Index information
         """
         try:
-            logger.info(f"Getting info for index '{index}'")
-            mappings = self.client.indices.get_mapping(index=index)
-            settings = self.client.indices.get_settings(index=index)
-            stats = self.client.indices.stats(index=index)
+            logger.info("Getting info for index '%s'", index)
             
-            return {
-                "mappings": mappings,
-                "settings": settings,
-                "stats": stats
-            }
+            # Stats come from a separate endpoint, so fetch them while the
+            # mappings and settings arrive together in a single request
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                stats_future = executor.submit(self.client.indices.stats, index=index)
+                info = self.client.indices.get(index=index, features=["mappings", "settings"])
+                stats = stats_future.result()
+            
+            return common.index_info(info, stats)
         except NotFoundError:
-            logger.error(f"Index '{index}' not found")
+            logger.error("Index '%s' not found", index)
             return {"error": f"Index '{index}' not found"}
         except Exception as e:
-            logger.error(f"Get index info error: {e}")
+            logger.error("Get index info error: %s", e)
             return {"error": str(e)}
     
     def list_indices(self) -> List[str]:
@@ -207,18 +362,27 @@ class ElasticsearchTools:
         Returns:
             List of index names
         """
+        cached = common.cached_indices()
+        if cached is not None:
+            return cached
+        
         try:
             logger.info("Listing all indices")
-            indices = self.client.cat.indices(format="json")
-            index_names = [idx["index"] for idx in indices if not idx["index"].startswith(".")]
-            logger.info(f"Found {len(index_names)} indices")
+            # Only the name column, as plain text with one index per line
+            index_names = common.cache_indices(
+                self.client.cat.indices(h="index", format="text").body
+            )
+            logger.info("Found %d indices", len(index_names))
             return index_names
         except Exception as e:
-            logger.error(f"List indices error: {e}")
+            logger.error("List indices error: %s", e)
             return []
     
     def aggregate(self, index: str, aggregations: Dict[str, Any], 
-                  query: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                  query: Optional[Dict[str, Any]] = None,
+                  terminate_after: Optional[int] = None,
+                  track_total_hits: bool = False,
+                  use_request_cache: bool = False) -> Dict[str, Any]:
         """
         Perform aggregations
         
@@ -226,23 +390,68 @@ class ElasticsearchTools:
             index: Index name
             aggregations: Aggregation DSL
             query: Optional query filter
+            terminate_after: Optional per-shard document collection limit
+            track_total_hits: Count all matching documents exactly
+            use_request_cache: Cache the response in the shard request cache
+                even where the index setting disables it
             
         Returns:
             Aggregation results
         """
         try:
-            body = {"aggs": aggregations, "size": 0}
-            if query:
-                body["query"] = query
+            body = QueryBuilder.aggregation_body(
+                aggregations, query, terminate_after, track_total_hits
+            )
             
-            logger.info(f"Running aggregations on index '{index}'")
-            response = self.client.search(index=index, body=body)
+            logger.info("Running aggregations on index '%s'", index)
+            response = self.client.search(
+                index=index, body=body, request_cache=use_request_cache or None
+            )
             logger.info("Aggregations completed successfully")
             return response
         except Exception as e:
-            logger.error(f"Aggregation error: {e}")
+            logger.error("Aggregation error: %s", e)
             return {"error": str(e)}
     
+    def count(self, index: str, query: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        Count documents matching a query
+        
+        Args:
+            index: Index name
+            query: Optional query filter
+            
+        Returns:
+            Number of matching documents, or None on error
+        """
+        try:
+            response = self.client.count(index=index, body=common.count_body(query))
+            logger.info("Index '%s' has %s matching documents", index, response["count"])
+            return response["count"]
+        except Exception as e:
+            logger.error("Count error: %s", e)
+            return None
+    
+    def msearch(self, searches: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Run several searches in a single _msearch request
+        
+        Args:
+            searches: List of (index, search body) pairs
+            
+        Returns:
+            One search response (or error) per search, in request order
+        """
+        try:
+            logger.info("Running %d searches in one msearch request", len(searches))
+            response = self.client.msearch(body=common.msearch_body(searches))
+            logger.info("Msearch completed successfully")
+            
+            return common.msearch_results(response)
+        except Exception as e:
+            logger.error("Msearch error: %s", e)
+            return [{"error": str(e)} for _ in searches]
+    
     def update_document(self, index: str, doc_id: str, 
                         update: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -257,20 +466,22 @@ class ElasticsearchTools:
             Update response
         """
         try:
-            logger.info(f"Updating document {doc_id} in index '{index}'")
+            logger.info("Updating document %s in index '%s'", doc_id, index)
             response = self.client.update(
                 index=index,
                 id=doc_id,
                 body={"doc": update}
             )
-            logger.info(f"Document {doc_id} updated successfully")
+            logger.info("Document %s updated successfully", doc_id)
             return response
         except NotFoundError:
-            logger.error(f"Document {doc_id} not found in index '{index}'")
+            logger.error("Document %s not found in index '%s'", doc_id, index)
             return {"error": "Document not found"}
         except Exception as e:
-            logger.error(f"Update error: {e}")
+            logger.error("Update error: %s", e)
             return {"error": str(e)}
+        finally:
+            self.invalidate(index)
     
     def delete_document(self, index: str, doc_id: str) -> Dict[str, Any]:
         """
@@ -284,13 +495,15 @@ class ElasticsearchTools:
             Delete response
         """
         try:
-            logger.info(f"Deleting document {doc_id} from index '{index}'")
+            logger.info("Deleting document %s from index '%s'", doc_id, index)
             response = self.client.delete(index=index, id=doc_id)
-            logger.info(f"Document {doc_id} deleted successfully")
+            logger.info("Document %s deleted successfully", doc_id)
             return response
         except NotFoundError:
-            logger.error(f"Document {doc_id} not found in index '{index}'")
+            logger.error("Document %s not found in index '%s'", doc_id, index)
             return {"error": "Document not found"}
         except Exception as e:
-            logger.error(f"Delete error: {e}")
+            logger.error("Delete error: %s", e)
             return {"error": str(e)}
+        finally:
+            self.invalidate(index)
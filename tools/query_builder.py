@@ -1,17 +1,25 @@
 """
 Query builder for Elasticsearch DSL
 """
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
 from utils.helpers import parse_date_range
 
+_MATCH_ALL = {"match_all": {}}
+
 
 class QueryBuilder:
-    """Build Elasticsearch queries from natural language"""
+    """
+    Build Elasticsearch queries from natural language
+    
+    Some builders return shared instances for repeated arguments, so returned
+    queries must be treated as read-only; wrap them rather than modifying them.
+    """
     
     @staticmethod
     def match_all() -> Dict[str, Any]:
         """Build match_all query"""
-        return {"match_all": {}}
+        return _MATCH_ALL
     
     @staticmethod
     def match(field: str, value: str, operator: str = "or") -> Dict[str, Any]:
@@ -119,6 +127,7 @@ class QueryBuilder:
         return {"prefix": {field: value}}
     
     @staticmethod
+    @lru_cache(maxsize=256)
     def exists(field: str) -> Dict[str, Any]:
         """
         Build exists query
@@ -242,23 +251,55 @@ class QueryBuilder:
         return {"range": {field: date_params}}
     
     @staticmethod
-    def aggregation_terms(field: str, size: int = 10) -> Dict[str, Any]:
+    def aggregation_body(aggregations: Dict[str, Any], 
+                         query: Optional[Dict[str, Any]] = None,
+                         terminate_after: Optional[int] = None,
+                         track_total_hits: bool = False) -> Dict[str, Any]:
+        """
+        Build a search body that only returns aggregations
+        
+        Args:
+            aggregations: Aggregation DSL
+            query: Optional query filter
+            terminate_after: Optional per-shard document collection limit
+            track_total_hits: Count all matching documents exactly (costs an
+                extra counting pass on every shard)
+            
+        Returns:
+            Search request body
+        """
+        body = {"aggs": aggregations, "size": 0, "track_total_hits": track_total_hits}
+        if query:
+            body["query"] = query
+        if terminate_after:
+            body["terminate_after"] = terminate_after
+        return body
+    
+    @staticmethod
+    def aggregation_terms(field: str, size: int = 10,
+                          execution_hint: Optional[str] = None,
+                          shard_size: Optional[int] = None) -> Dict[str, Any]:
         """
         Build terms aggregation
         
         Args:
             field: Field to aggregate
             size: Number of buckets
+            execution_hint: Optional collection strategy (global_ordinals, map)
+            shard_size: Optional number of candidate buckets per shard
             
         Returns:
             Terms aggregation
         """
-        return {
-            "terms": {
-                "field": field,
-                "size": size
-            }
+        params = {
+            "field": field,
+            "size": size
         }
+        if execution_hint:
+            params["execution_hint"] = execution_hint
+        if shard_size:
+            params["shard_size"] = shard_size
+        return {"terms": params}
     
     @staticmethod
     def aggregation_date_histogram(field: str, interval: str = "1d") -> Dict[str, Any]:
@@ -319,14 +360,25 @@ class QueryBuilder:
         return {"sum": {"field": field}}
     
     @staticmethod
-    def aggregation_cardinality(field: str) -> Dict[str, Any]:
+    @lru_cache(maxsize=256)
+    def aggregation_cardinality(field: str, 
+                                precision_threshold: Optional[int] = None,
+                                execution_hint: Optional[str] = None) -> Dict[str, Any]:
         """
         Build cardinality (unique count) aggregation
         
         Args:
             field: Field name
+            precision_threshold: Count below which results are expected to be
+                close to exact (server default is 3000)
+            execution_hint: Optional collection strategy
             
         Returns:
             Cardinality aggregation
         """
-        return {"cardinality": {"field": field}}
+        params = {"field": field}
+        if precision_threshold is not None:
+            params["precision_threshold"] = precision_threshold
+        if execution_hint:
+            params["execution_hint"] = execution_hint
+        return {"cardinality": params}
@@ -0,0 +1,57 @@
+"""
+Serializers for the Elasticsearch client
+"""
+from typing import Any, ClassVar
+import orjson
+from elasticsearch.serializer import JsonSerializer, SerializationError
+
+
+class OrjsonSerializer(JsonSerializer):
+    """JSON serializer backed by orjson instead of the standard library json module"""
+    
+    def loads(self, data: bytes) -> Any:
+        """
+        Decode a response body
+        
+        Args:
+            data: Raw response body
+            
+        Returns:
+            Decoded JSON value
+        """
+        # Some responses are typed as JSON but have no body
+        if data == b"":
+            return None
+        
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError as e:
+            raise SerializationError(f"Unable to deserialize as JSON: {data!r}", errors=(e,))
+    
+    def dumps(self, data: Any) -> bytes:
+        """
+        Encode a request body
+        
+        Args:
+            data: Request body
+            
+        Returns:
+            Encoded JSON bytes
+        """
+        # Bodies that are already encoded are forwarded as-is
+        if isinstance(data, (str, bytes)):
+            return super().dumps(data)
+        
+        try:
+            return orjson.dumps(data, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError as e:
+            raise SerializationError(
+                f"Unable to serialize to JSON: {data!r} (type: {type(data).__name__})",
+                errors=(e,)
+            )
+
+
+class CompatibilityModeOrjsonSerializer(OrjsonSerializer):
+    """orjson serializer for the versioned compatibility-mode JSON mimetype"""
+    
+    mimetype: ClassVar[str] = "application/vnd.elasticsearch+json"
@@ -1,5 +1,6 @@
 """Utility module"""
 from .logger import setup_logger
+from .cache import LRUCache
 from .helpers import (
     format_es_response,
     format_aggregation_response,
@@ -7,16 +8,19 @@ from .helpers import (
     extract_field_names,
     sanitize_index_name,
     build_must_query,
-    build_should_query
+    build_should_query,
+    query_fingerprint
 )
 
 __all__ = [
     'setup_logger',
+    'LRUCache',
     'format_es_response',
     'format_aggregation_response',
     'parse_date_range',
     'extract_field_names',
     'sanitize_index_name',
     'build_must_query',
-    'build_should_query'
+    'build_should_query',
+    'query_fingerprint'
 ]
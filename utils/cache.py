@@ -0,0 +1,82 @@
+"""
+In-process caching utilities
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with optional entry expiry"""
+    
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        """
+        Initialize cache
+        
+        Args:
+            maxsize: Maximum number of entries kept
+            ttl: Optional entry lifetime in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value
+        
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+            
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entries if full
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def pop(self, key: Hashable) -> None:
+        """Remove a single entry if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def keys(self) -> List[Hashable]:
+        """Get a snapshot of the current keys, least recently used first"""
+        with self._lock:
+            return list(self._entries)
+    
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
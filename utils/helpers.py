@@ -1,9 +1,41 @@
 """
 Helper utilities for the application
 """
-import json
+import re
+from hashlib import blake2b
 from typing import Any, Dict, List
 from datetime import datetime
+import orjson
+
+
+_INDENT_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+# Date range phrases, highest priority first, and the range each one maps to
+_DATE_RANGES = (
+    (("last week", "past week"), {"gte": "now-1w/d"}),
+    (("last month", "past month"), {"gte": "now-1M/d"}),
+    (("last year", "past year"), {"gte": "now-1y/d"}),
+    (("today",), {"gte": "now/d"}),
+    (("yesterday",), {"gte": "now-1d/d", "lte": "now-1d/d"}),
+)
+_DATE_PHRASE_PRIORITY = {
+    phrase: priority
+    for priority, (phrases, _) in enumerate(_DATE_RANGES)
+    for phrase in phrases
+}
+_DATE_PHRASE_RE = re.compile(
+    "|".join(map(re.escape, _DATE_PHRASE_PRIORITY)), re.IGNORECASE
+)
+
+# A word that follows a field indicator; the lookahead lets matches overlap
+_FIELD_RE = re.compile(
+    r"(?<!\S)(?:(?:field|column|attribute|property):\s*|(?:in\s+the|from\s+the|by|where)\s+)"
+    r"(?=(\S+))",
+    re.IGNORECASE
+)
+
+# Characters not allowed in index names, all replaced with underscores
+_INDEX_NAME_TRANS = str.maketrans(dict.fromkeys(' /\\*?"<>|#,', '_'))
 
 
 def format_es_response(response: Dict[str, Any]) -> str:
@@ -20,14 +52,14 @@ def format_es_response(response: Dict[str, Any]) -> str:
         hits = response["hits"]["hits"]
         total = response["hits"]["total"]["value"]
         
-        formatted = f"Found {total} documents:\n\n"
+        parts = [f"Found {total} documents:\n\n"]
         for i, hit in enumerate(hits, 1):
-            formatted += f"{i}. [ID: {hit['_id']}]\n"
-            formatted += json.dumps(hit["_source"], indent=2)
-            formatted += "\n\n"
-        return formatted
+            parts.append(f"{i}. [ID: {hit['_id']}]\n")
+            parts.append(orjson.dumps(hit["_source"], option=_INDENT_OPTIONS).decode())
+            parts.append("\n\n")
+        return "".join(parts)
     
-    return json.dumps(response, indent=2)
+    return orjson.dumps(response, option=_INDENT_OPTIONS).decode()
 
 
 def format_aggregation_response(response: Dict[str, Any]) -> str:
@@ -44,18 +76,20 @@ def format_aggregation_response(response: Dict[str, Any]) -> str:
         return "No aggregations found"
     
     aggs = response["aggregations"]
-    formatted = "Aggregation Results:\n\n"
+    parts = ["Aggregation Results:\n\n"]
     
     for key, value in aggs.items():
-        formatted += f"{key}:\n"
+        parts.append(f"{key}:\n")
         if "buckets" in value:
-            for bucket in value["buckets"]:
-                formatted += f"  - {bucket.get('key', 'N/A')}: {bucket.get('doc_count', 0)}\n"
+            parts.extend(
+                f"  - {bucket.get('key', 'N/A')}: {bucket.get('doc_count', 0)}\n"
+                for bucket in value["buckets"]
+            )
         elif "value" in value:
-            formatted += f"  Value: {value['value']}\n"
-        formatted += "\n"
+            parts.append(f"  Value: {value['value']}\n")
+        parts.append("\n")
     
-    return formatted
+    return "".join(parts)
 
 
 def parse_date_range(text: str) -> Dict[str, str]:
@@ -68,22 +102,14 @@ def parse_date_range(text: str) -> Dict[str, str]:
     Returns:
         Dictionary with 'gte' and/or 'lte' keys
     """
-    text_lower = text.lower()
-    result = {}
-    
-    if "last week" in text_lower or "past week" in text_lower:
-        result["gte"] = "now-1w/d"
-    elif "last month" in text_lower or "past month" in text_lower:
-        result["gte"] = "now-1M/d"
-    elif "last year" in text_lower or "past year" in text_lower:
-        result["gte"] = "now-1y/d"
-    elif "today" in text_lower:
-        result["gte"] = "now/d"
-    elif "yesterday" in text_lower:
-        result["gte"] = "now-1d/d"
-        result["lte"] = "now-1d/d"
+    # One pass finds every phrase; the highest priority one wins, wherever it is
+    priorities = [
+        _DATE_PHRASE_PRIORITY[phrase.lower()] for phrase in _DATE_PHRASE_RE.findall(text)
+    ]
+    if not priorities:
+        return {}
     
-    return result
+    return dict(_DATE_RANGES[min(priorities)][1])
 
 
 def extract_field_names(query: str) -> List[str]:
@@ -96,21 +122,7 @@ def extract_field_names(query: str) -> List[str]:
     Returns:
         List of potential field names
     """
-    # Common field patterns
-    field_indicators = [
-        "field:", "column:", "attribute:", "property:",
-        "in the", "from the", "by", "where"
-    ]
-    
-    fields = []
-    words = query.split()
-    
-    for i, word in enumerate(words):
-        if word.lower() in field_indicators and i + 1 < len(words):
-            potential_field = words[i + 1].strip(".,?!")
-            fields.append(potential_field)
-    
-    return fields
+    return [match.group(1).strip(".,?!") for match in _FIELD_RE.finditer(query)]
 
 
 def sanitize_index_name(name: str) -> str:
@@ -127,9 +139,7 @@ def sanitize_index_name(name: str) -> str:
     name = name.lower()
     
     # Replace spaces and invalid chars with underscores
-    invalid_chars = [' ', '/', '\\', '*', '?', '"', '<', '>', '|', '#', ',']
-    for char in invalid_chars:
-        name = name.replace(char, '_')
+    name = name.translate(_INDEX_NAME_TRANS)
     
     # Cannot start with -, _, +
     name = name.lstrip('-_+')
@@ -174,3 +184,20 @@ def build_should_query(conditions: List[Dict[str, Any]]) -> Dict[str, Any]:
             "minimum_should_match": 1
         }
     }
+
+
+def query_fingerprint(query: Any) -> bytes:
+    """
+    Fingerprint a query or request body for use as a cache key
+    
+    Keys are sorted before hashing, so bodies that only differ in key order
+    get the same fingerprint.
+    
+    Args:
+        query: JSON-serializable query DSL or request body
+        
+    Returns:
+        16-byte BLAKE2b digest of the canonical JSON encoding
+    """
+    canonical = orjson.dumps(query, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return blake2b(canonical, digest_size=16).digest()
@@ -1,12 +1,60 @@
 """
 Logging utility for the application
 """
+import atexit
 import logging
+import queue
 import sys
+import threading
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from typing import Dict
 from config.config import config
 
+# The log formats never show thread or process details, so skip collecting them per record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
 
+# One queue per log file, drained by a background listener that owns the file
+_FILE_QUEUES: Dict[str, queue.Queue] = {}
+_FILE_QUEUES_LOCK = threading.Lock()
+
+
+def _file_queue(log_file: str) -> queue.Queue:
+    """
+    Get the queue feeding a log file, starting its writer thread on first use
+    
+    Args:
+        log_file: Log file name inside the logs directory
+        
+    Returns:
+        Queue that records for the file are put on
+    """
+    with _FILE_QUEUES_LOCK:
+        log_queue = _FILE_QUEUES.get(log_file)
+        if log_queue is None:
+            log_path = Path("logs")
+            log_path.mkdir(exist_ok=True)
+            file_handler = logging.FileHandler(log_path / log_file)
+            file_handler.setLevel(logging.DEBUG)
+            file_format = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
+            )
+            file_handler.setFormatter(file_format)
+            
+            log_queue = queue.Queue(-1)
+            listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+            listener.start()
+            # Stopping flushes the records still queued at shutdown
+            atexit.register(listener.stop)
+            _FILE_QUEUES[log_file] = log_queue
+        
+        return log_queue
+
+
+@lru_cache(maxsize=None)
 def setup_logger(name: str, log_file: str = None) -> logging.Logger:
     """
     Set up logger with console and optional file output
@@ -21,7 +69,7 @@ def setup_logger(name: str, log_file: str = None) -> logging.Logger:
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, config.log_level.upper()))
     
-    # Avoid duplicate handlers
+    # Avoid duplicate handlers when the same logger is requested with other arguments
     if logger.handlers:
         return logger
     
@@ -35,16 +83,8 @@ def setup_logger(name: str, log_file: str = None) -> logging.Logger:
     console_handler.setFormatter(console_format)
     logger.addHandler(console_handler)
     
-    # File handler
+    # File output is written by a background thread so callers never block on disk I/O
     if log_file:
-        log_path = Path("logs")
-        log_path.mkdir(exist_ok=True)
-        file_handler = logging.FileHandler(log_path / log_file)
-        file_handler.setLevel(logging.DEBUG)
-        file_format = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
-        )
-        file_handler.setFormatter(file_format)
-        logger.addHandler(file_handler)
+        logger.addHandler(QueueHandler(_file_queue(log_file)))
     
     return logger